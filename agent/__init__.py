@@ -2,6 +2,8 @@ from .agent import Agent
 from .simple_q_learning_agent import SimpleQLearningAgent
 from .q_ucb_h_learning import QUCBHLearningAgent
 from .q_ucb_h_plus_learning import QUCBHPlusLearningAgent
+from .trajectory import TrajectoryRecorder, load_trajectory
+from .interning import InterningWrapper, ObservationIndex
 
 
 __all__ = [
@@ -9,5 +11,9 @@ __all__ = [
     'SimpleQLearningAgent',
     'QUCBHLearningAgent',
     'QUCBHPlusLearningAgent',
+    'TrajectoryRecorder',
+    'load_trajectory',
+    'InterningWrapper',
+    'ObservationIndex',
     'policy'
 ]
@@ -27,12 +27,18 @@ class Agent:
 
         self._verboseness = verb
         self.name = name
+        self._monitor = None
+        self._stopping_rule = None
+        self._converged = False
 
     def reset_environment(self):
         if self._env is not None:
             self._env.reset()
         if self._policy is not None:
             self._policy.reset()
+        if self._stopping_rule is not None:
+            self._stopping_rule.reset()
+        self._converged = False
 
     def set_verboseness(self, verboseness: int):
         """
@@ -41,6 +47,22 @@ class Agent:
         """
         self._verboseness = verboseness
 
+    def set_monitor(self, monitor):
+        """
+        Sets a monitor that is notified at the end of each episode and of the episodes skipped after convergence
+        :param monitor: object with episode_done(agent_name, steps) and episodes_skipped(agent_name, num_episodes)
+        methods, e.g., process_results.Metrics
+        """
+        self._monitor = monitor
+
+    def set_stopping_rule(self, rule):
+        """
+        Sets a rule that ends learning early once the agent has converged;
+        the remaining episodes are then filled in by _fill_episodes()
+        :param rule: object with check(agent) and reset() methods, e.g., process_results.ConvergenceRule
+        """
+        self._stopping_rule = rule
+
     def run(self, num_episodes: int):
         """
         Run the agent for a given number of episodes
@@ -56,44 +78,69 @@ class Agent:
 
         for episode in episode_range:
 
-            # initialize episode
-            done = False
-            observation = self._initialize_episode()
-
-            while not done:
+            # once converged, the remaining episodes are not run
+            if self._converged:
+                self._fill_episodes(num_episodes - episode)
+                if self._monitor is not None:
+                    self._monitor.episodes_skipped(self.name, num_episodes - episode)
+                break
 
-                # chose an action
-                action = self._get_action(observation)
-
-                # perform an action, get data from the environment
-                next_observation, reward, done, info = self._step(observation, action)
-
-                # learn from the observation
-                self._learn(observation, action, next_observation, reward, done, info)
-
-                # proceed to the next step
-                observation = next_observation
-
-                # finish the step
-                self._wrap_up_step()
+            # run the episode
+            steps = self._run_episode()
 
             # finish the episode
             self._wrap_up_episode(episode)
+            if self._monitor is not None:
+                self._monitor.episode_done(self.name, steps)
+            if self._stopping_rule is not None:
+                self._converged = self._stopping_rule.check(self)
 
         # finish the run
         self._wrap_up_run()
         return self._run_results()
 
+    def _run_episode(self):
+        """
+        runs a single episode step by step
+        :return: number of steps taken
+        """
+
+        # initialize episode
+        done = False
+        steps = 0
+        observation = self._initialize_episode()
+
+        while not done:
+
+            # chose an action
+            action = self._get_action(observation)
+
+            # perform an action, get data from the environment
+            next_observation, reward, done, info = self._step(observation, action)
+
+            # learn from the observation
+            self._learn(observation, action, next_observation, reward, done, info)
+
+            # proceed to the next step
+            observation = next_observation
+
+            # finish the step
+            self._wrap_up_step()
+            steps += 1
+
+        return steps
+
     def learned_policy(self):
         """
         Agent's current idea of what the best policy is
         """
         pass
 
-    def get_stats(self, episode=None):
+    def get_stats(self, episode=None, start=0):
         """
         Returns results of running an episode or all of the episodes
         :param episode: Episode number; if None, return data for all of the episodes
+        :param start: first episode to return data for if the episode is None
         :return: a dictionary of results
         """
         return {}
@@ -147,6 +194,13 @@ class Agent:
         """
         return self._env.step(action)
 
+    def _fill_episodes(self, num_episodes):
+        """
+        fills in the results of the episodes that are skipped after convergence
+        :param num_episodes: number of skipped episodes
+        """
+        pass
+
     def _wrap_up_step(self):
         """
         things to do at the end of each step
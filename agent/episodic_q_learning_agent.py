@@ -1,10 +1,18 @@
 from .agent import DiscreteAgent
+from .interning import find_interning
+from .policy import UCBPolicy
 import gym.wrappers.time_limit as tl
 import numpy as np
+from bisect import bisect_right
+from gym import Wrapper
+from gym.envs.toy_text.discrete import DiscreteEnv
 from itertools import accumulate
+from typing import Iterable, Union
 
 DEFAULT_DISCOUNT = 1.0
 DEFAULT_DETECT = True
+DEFAULT_Q_DTYPE = np.float64
+DEFAULT_COUNT_DTYPE = np.int64
 
 
 def _default_alpha(h):
@@ -14,10 +22,12 @@ def _default_alpha(h):
 class EpisodicQLearningAgent(DiscreteAgent):
 
     def __init__(self, env: tl.TimeLimit, policy=None, name=None, verb=0, discount=None,
-                 starting_q=0.0, detect_terminals=True, learning_rate=None):
+                 starting_q=0.0, detect_terminals=True, learning_rate=None,
+                 q_dtype=DEFAULT_Q_DTYPE, count_dtype=DEFAULT_COUNT_DTYPE, fused=False, stationary=False):
         """
         Simple episodic Q-learning agent
-        :param env: OpenAI Gym environment; must be gym.wrappers.time_limit.TimeLimit for episodic learning
+        :param env: OpenAI Gym environment; must be gym.wrappers.time_limit.TimeLimit for episodic learning.
+        If it wraps an agent.InterningWrapper, the tables grow with the number of states seen.
         :param policy: Learning policy, e.g., epsilon-greedy for Q-learning
         :param name: Agent's name for displaying
         :param verb: Verbosity
@@ -25,34 +35,211 @@ class EpisodicQLearningAgent(DiscreteAgent):
         :param starting_q: starting Q-values
         :param detect_terminals: Can the agent detect that the episode is terminated from the 'done' signal?
         :param learning_rate: learning rate function
+        :param q_dtype: floating point type of the Q-table, e.g., numpy.float32 to halve its memory footprint
+        :param count_dtype: integer type of the visit counts, e.g., numpy.uint16; the counts saturate at its maximum
+        :param fused: whether to run the episodes in a single loop that samples the transitions directly from
+        the environment's model; the results are identical. Falls back to the regular loop if the environment is not
+        a DiscreteEnv wrapped in TimeLimits only.
+        :param stationary: whether to learn a single Q-table for all time steps instead of one per step; requires
+        a discount below 1. The learning rate uses the effective horizon 1 / (1 - discount), and episodes cut off by
+        the time limit are not treated as terminated.
         """
-        super().__init__(env.unwrapped, policy, name, verb)
+        interning = find_interning(env)
+        super().__init__(env.unwrapped if interning is None else interning, policy, name, verb)
         self._env, self._unwrapped_env = env, env.unwrapped
+        self._interned = interning is not None
+        self._capacity = self._nS if interning is None else interning.capacity
         self._discount = DEFAULT_DISCOUNT if discount is None else discount
         assert float('-inf') < starting_q < float('inf'), 'Starting Q-value for Q-learning must be finite'
         self._starting_q = starting_q
         self._nH = env._max_episode_steps
+        self._stationary = stationary
+        assert not stationary or self._discount < 1, 'Stationary Q-tables require a discount below 1'
 
         self._detect_terminals = detect_terminals
-        self._alpha = _default_alpha(self._nH) if learning_rate is None else learning_rate
+        horizon = 1.0 / (1.0 - self._discount) if stationary else self._nH
+        self._alpha = _default_alpha(horizon) if learning_rate is None else learning_rate
         self._episode_rewards = [[]]
 
+        self._q_dtype = np.dtype(q_dtype)
+        self._count_dtype = np.dtype(count_dtype)
+        assert np.issubdtype(self._q_dtype, np.floating), 'Q-table must have a floating point type'
+        assert np.issubdtype(self._count_dtype, np.integer), 'Visit counts must have an integer type'
+        self._max_count = np.iinfo(self._count_dtype).max
+
         if self._env is not None:
             self._fill_q()
 
-        self._n_visits = np.zeros((self._nH, self._nS, self._nA), dtype=int)
+        self._n_visits = np.zeros((self._n_layers(), self._capacity, self._nA), dtype=self._count_dtype)
+        self._recorder = None
+        self._trajectory = None
+        self._filled_stats, self._n_filled = None, 0
+        self._fused = fused
+        self._model = None
+        self._episode = None
+
+    def set_recorder(self, recorder):
+        """
+        Sets a recorder that takes snapshots of the Q-table and the visit counts at the end of each episode
+        :param recorder: object with a record(episode, q, n_visits) method, e.g., process_results.HistoryRecorder
+        """
+        self._recorder = recorder
+
+    def set_trajectory_recorder(self, trajectory):
+        """
+        Sets a recorder that receives every transition the agent learns from
+        :param trajectory: object with an append(h, s, a, r, s', done) method, e.g., agent.TrajectoryRecorder
+        """
+        self._trajectory = trajectory
+
+    def replay(self, transitions: Union[np.ndarray, Iterable[np.ndarray]]):
+        """
+        Learns from recorded transitions in the recorded order. Replaying a trajectory into a freshly reset agent
+        reproduces the tables of the agent that recorded it. Stationary agents record episodes cut off by the time limit
+        as not done.
+        :param transitions: structured array of transitions, see agent.load_trajectory(), or an iterable of such arrays
+        """
+        chunks = [transitions] if isinstance(transitions, np.ndarray) else transitions
+        for chunk in chunks:
+            for h, observation, action, reward, next_observation, done in chunk.tolist():
+                if self._interned:
+                    self._ensure(max(observation, next_observation))
+                self._visit(h, observation, action)
+                self._update(h, observation, action, next_observation, reward, done)
+
+    def ingest(self, h, observation, action, reward, next_observation, done):
+        """
+        Learns from a batch of externally supplied transitions as if they were learned one by one in the given
+        order, e.g., from logs. The visit counts of repeated (h, s, a) within the batch are applied in order.
+        The batch is processed a time step at a time, from the last step to the first: every update is an affine map
+        of the previous Q-value, the maps of each state-action pair are composed by a parallel scan, and the values of
+        the next step are looked up as of the time of each transition. The results equal those of replay()
+        up to floating-point rounding. Stationary agents learn one transition at a time.
+        The throughput is bounded by the maxima of the next states' rows, which take O(nA) per update of the next step,
+        and by the sorts, which take O(n log n) per step: some 10^5 to 10^6 transitions per second rather than
+        millions, e.g., with the 41 actions of Replacement-v0.
+        :param h: time steps, integer array of shape (n,)
+        :param observation: current observations
+        :param action: chosen actions
+        :param reward: rewards received
+        :param next_observation: new observations after taking the chosen actions
+        :param done: were the episodes done? With a stationary agent, episodes cut off by the time limit are not done
+        """
+        h, s, a = (np.asarray(x, dtype=np.int64) for x in (h, observation, action))
+        s_next = np.asarray(next_observation, dtype=np.int64)
+        r = np.asarray(reward, dtype=np.float64)
+        done = np.asarray(done, dtype=bool)
+        n = len(h)
+        if n == 0:
+            return
+        if self._interned:
+            self._ensure(int(max(s.max(), s_next.max())))
+        assert h.min() >= 0 and h.max() < self._nH, 'Time steps must be within the horizon'
+        assert min(s.min(), s_next.min()) >= 0 and max(s.max(), s_next.max()) < self._capacity, 'Unknown states'
+        assert a.min() >= 0 and a.max() < self._nA, 'Unknown actions'
+
+        if self._stationary:
+            for h_i, s_i, a_i, r_i, s_next_i, d_i in zip(h.tolist(), s.tolist(), a.tolist(), r.tolist(),
+                                                         s_next.tolist(), done.tolist()):
+                self._visit(h_i, s_i, a_i)
+                self._update(h_i, s_i, a_i, s_next_i, r_i, d_i)
+            return
+
+        nA = self._nA
+        terminal = done & self._detect_terminals
+        resets = terminal & self._resets_terminals()
+        order = np.argsort(h, kind='stable')
+        bounds = np.searchsorted(h[order], np.arange(self._nH + 1))
+
+        def level(step):
+            return order[bounds[step]:bounds[step + 1]] if step < self._nH else order[:0]
+
+        # the history of the next step's Q-values: its initial values and its events ordered by (cell, index)
+        upper_q = self._q[self._nH].astype(np.float64)
+        upper_keys, upper_values = _row_events(level(self._nH - 1), resets, s_next, n, nA)
+
+        for step in range(self._nH - 1, -1, -1):
+            sel = level(step)
+            q_row = self._q[step].astype(np.float64)
+
+            # the next state's value as of the time of each transition
+            next_q = np.zeros(len(sel))
+            live = sel[~terminal[sel]]
+            if len(live) > 0:
+                values = _max_as_of(upper_q.reshape(-1, nA), upper_keys, upper_values, s_next[live], live, n)
+                next_q[~terminal[sel]] = np.minimum(values, self._next_bound())
+
+            # the visit counts in the order of the visits of each state-action pair
+            cells = s[sel] * nA + a[sel]
+            by_cell = np.argsort(cells, kind='stable')
+            sorted_cells = cells[by_cell]
+            first = np.searchsorted(sorted_cells, sorted_cells)
+            rank = np.empty(len(sel), dtype=np.int64)
+            rank[by_cell] = np.arange(len(sel)) - first
+            n_row = self._n_visits[step].reshape(-1)
+            t = np.minimum(n_row[cells].astype(np.int64) + rank + 1, self._max_count)
+            last = np.append(sorted_cells[1:] != sorted_cells[:-1], True)[:len(sel)]
+            n_row[sorted_cells[last]] = t[by_cell][last]
+
+            # every update and every reset of the row is an affine map Q -> A Q + B
+            alpha, bonus = self._terms(step, t.astype(np.float64))
+            target = r[sel] + self._discount * next_q + bonus
+            reset_keys, _ = _row_events(level(step - 1) if step > 0 else order[:0], resets, s_next, n, nA)
+            event_cells = np.concatenate((cells, reset_keys // (n + 1)))
+            event_index = np.concatenate((sel, reset_keys % (n + 1)))
+            scale = np.concatenate((1.0 - alpha, np.zeros(len(reset_keys))))
+            shift = np.concatenate((alpha * target, np.zeros(len(reset_keys))))
+            event_keys = event_cells * (n + 1) + event_index
+            by_key = np.argsort(event_keys)
+            event_keys, event_cells = event_keys[by_key], event_cells[by_key]
+            scale, shift = _affine_scan(event_cells, scale[by_key], shift[by_key])
+            values = scale * q_row.reshape(-1)[event_cells] + shift
+
+            # the last event of each pair is its new Q-value
+            last = np.append(event_cells[1:] != event_cells[:-1], True)[:len(event_cells)]
+            self._q[step].reshape(-1)[event_cells[last]] = values[last]
+            upper_q, upper_keys, upper_values = q_row, event_keys, values
+
+    def ingest_stream(self, chunks: Iterable):
+        """
+        Learns from a stream of batches of transitions, see ingest(); e.g., a large log file read in chunks
+        :param chunks: iterable of structured arrays with fields h, s, a, r, next, and done, such as the chunks of
+        agent.load_trajectory(), or of tuples (h, s, a, r, s', done) of arrays
+        """
+        for chunk in chunks:
+            if isinstance(chunk, np.ndarray) and chunk.dtype.names is not None:
+                self.ingest(chunk['h'], chunk['s'], chunk['a'], chunk['r'], chunk['next'], chunk['done'])
+            else:
+                self.ingest(*chunk)
+
+    def run(self, num_episodes: int):
+        self._episode = self._fused_episode() if self._fused else None
+        return super().run(num_episodes)
 
     def reset_environment(self):
         super().reset_environment()
         self._episode_rewards = [[]]
+        self._filled_stats, self._n_filled = None, 0
+        if self._interned:
+            self._capacity = find_interning(self._env).capacity
         self._fill_q()
-        self._n_visits = np.zeros((self._nH, self._nS, self._nA), dtype=int)
+        self._n_visits = np.zeros((self._n_layers(), self._capacity, self._nA), dtype=self._count_dtype)
+
+    def _initialize_episode(self):
+        observation = super()._initialize_episode()
+        if self._interned:
+            self._ensure(observation)
+        return observation
 
     def _step(self, observation, action):
         h = self._env._elapsed_steps
-        self._n_visits[h][observation][action] += 1
+        self._visit(h, observation, action)
 
         next_state, reward, done, info = super()._step(observation, action)
+        if self._interned:
+            self._ensure(next_state)
+        if self._trajectory is not None:
+            self._trajectory.append(h, observation, action, reward, next_state, self._terminal(done, info))
 
         # accumulate rewards
         if self._episode_rewards[-1] is None:
@@ -60,19 +247,218 @@ class EpisodicQLearningAgent(DiscreteAgent):
         self._episode_rewards[-1].append(reward)
         return next_state, reward, done, info
 
+    def _run_episode(self):
+        if self._episode is None:
+            return super()._run_episode()
+        return self._episode()
+
+    def _fused_episode(self):
+        """
+        builds a function that runs a single episode in one loop: the action selection, the transition sampled
+        from the environment's model, the visit count, and the update. The random numbers are drawn exactly as
+        by DiscreteEnv.step(), so the results are identical to the regular loop.
+        :return: the function returning the number of steps taken, or None if the environment does not allow it
+        """
+        # the hooks of the regular loop must not be overridden
+        hooks = ('_get_action', '_step', '_learn', '_wrap_up_step')
+        if any(getattr(type(self), hook) is not getattr(EpisodicQLearningAgent, hook) for hook in hooks):
+            return None
+
+        layers, env = [], self._env
+        while isinstance(env, Wrapper):
+            if not isinstance(env, tl.TimeLimit) or type(env).step is not tl.TimeLimit.step:
+                return None
+            layers.append(env)
+            env = env.env
+        if not isinstance(env, DiscreteEnv) or type(env).step is not DiscreteEnv.step:
+            return None
+
+        # the transitions of each state-action pair as in gym.envs.toy_text.discrete.categorical_sample()
+        if self._model is None:
+            cdf = [[np.cumsum(np.asarray([t[0] for t in env.P[s][a]])).tolist() for a in range(self._nA)]
+                   for s in range(self._nS)]
+            outcomes = [[[(int(t[1]), t[2], t[3]) for t in env.P[s][a]] for a in range(self._nA)]
+                        for s in range(self._nS)]
+            self._model = cdf, outcomes
+        cdf, outcomes = self._model
+
+        horizon = min(layer._max_episode_steps for layer in layers)
+        stationary = self._stationary
+        q, n_visits, max_count = self._q, self._n_visits, self._max_count
+        update, reset, rand = self._update, self._env.reset, env.np_random.rand
+        greedy = type(self._policy) is UCBPolicy
+        get_action = self._policy.get_action
+        episode_rewards, trajectory = self._episode_rewards, self._trajectory
+
+        def episode():
+            rewards = episode_rewards[-1]
+            s, h, done, a = reset(), 0, False, None
+            while not done:
+                k = 0 if stationary else h
+                a = q[k, s].argmax() if greedy else get_action((k, s), q)
+                if n_visits[k, s, a] < max_count:
+                    n_visits[k, s, a] += 1
+                p = cdf[s][a]
+                i = bisect_right(p, rand())
+                s_next, r, d = outcomes[s][a][i if i < len(p) else 0]
+                done = d or h + 1 >= horizon
+                terminal = d if stationary else done
+                if trajectory is not None:
+                    trajectory.append(h, s, a, r, s_next, terminal)
+                rewards.append(r)
+                update(h, s, a, s_next, r, terminal)
+                s, h = s_next, h + 1
+
+            # leave the environment as if it had been stepped through
+            env.s, env.lastaction = s, a
+            for layer in layers:
+                layer._elapsed_steps = h
+            return h
+
+        return episode
+
+    def _ensure(self, observation):
+        """
+        grows the tables geometrically until they have a row for the observation's id
+        :param observation: id of an interned observation
+        """
+        if observation < self._capacity:
+            return
+        capacity = max(min(2 * self._capacity, self._nS), observation + 1)
+        n_new = capacity - self._capacity
+        self._q = np.concatenate((self._q, self._initial_q(n_new)), axis=1)
+        self._n_visits = np.concatenate(
+            (self._n_visits, np.zeros((self._n_layers(), n_new, self._nA), dtype=self._count_dtype)), axis=1)
+        self._capacity = capacity
+
+    def _visit(self, step, observation, action):
+        """
+        counts a visit of a state-action pair; the count saturates at the maximum of its type
+        :param step: time step
+        :param observation: current observation
+        :param action: chosen action
+        """
+        if self._stationary:
+            step = 0
+        if self._n_visits[step, observation, action] < self._max_count:
+            self._n_visits[step, observation, action] += 1
+
+    def _terms(self, step, t):
+        """
+        vectorized learning rates and exploration bonuses of the updates of a time step, see ingest()
+        :param step: time step
+        :param t: visit counts of the updated state-action pairs, including the current visits
+        :return: (learning rates, bonuses)
+        """
+        return self._alpha(t), np.zeros(len(t))
+
+    def _next_bound(self):
+        """
+        upper bound on the value of the next state in the updates
+        """
+        return np.inf
+
+    def _resets_terminals(self):
+        """
+        whether the Q-values of terminal states are set to zero when they are reached
+        """
+        return False
+
+    def _n_layers(self):
+        """
+        number of time steps with their own visit counts and Q-values
+        """
+        return 1 if self._stationary else self._nH
+
+    def _layers(self, step):
+        """
+        indices of the Q-table of a time step and of the next one
+        :param step: time step
+        :return: (current, next)
+        """
+        return (0, 0) if self._stationary else (step, step + 1)
+
+    def _terminal(self, done, info):
+        """
+        whether the next state is terminal for learning; stationary agents keep learning across the time limit
+        """
+        return done and not (self._stationary and info.get('TimeLimit.truncated', False))
+
+    def _learn(self, observation, action, next_observation, reward, done, info):
+        self._update(self.current_step(), observation, action, next_observation, reward, self._terminal(done, info))
+
+    def _update(self, step, observation, action, next_observation, reward, done):
+        """
+        updates the Q-table with a single transition
+        :param step: time step of the transition
+        :param observation: current observation
+        :param action: chosen action
+        :param next_observation: new observation after taking the chosen action
+        :param reward: reward received
+        :param done: is the episode done?
+        """
+        pass
+
     def _get_action(self, observation):
-        action = self._policy.get_action((self._env._elapsed_steps, observation), self._q)
+        step = 0 if self._stationary else self._env._elapsed_steps
+        action = self._policy.get_action((step, observation), self._q)
         return action
 
     def _wrap_up_episode(self, episode):
         super()._wrap_up_episode(episode)
+        if self._recorder is not None:
+            self._recorder.record(len(self._episode_rewards) - 1, self._q, self._n_visits)
         self._episode_rewards.append([])
 
+    def _fill_episodes(self, num_episodes):
+        self._filled_stats = self._stopping_rule.stats()
+        self._n_filled += num_episodes
+
     def _run_results(self):
         return self._episode_rewards
 
-    def get_stats(self, episode=None):
-        if episode is not None:
+    def get_tables(self):
+        """
+        Agent's learned tables
+        :return: a dictionary with the Q-table 'q' and the visit counts 'n_visits'
+        """
+        return {'q': self._q, 'n_visits': self._n_visits}
+
+    def export_policy(self, file_name: str, margins: bool = False):
+        """
+        Writes the greedy policy for every step into a compact file that policy_table.PolicyTable answers
+        batched queries from
+        :param file_name: file to write the policy to
+        :param margins: whether to also write the differences between the best and the second best Q-values
+        """
+        from policy_table import write_policy
+
+        q = self._q[:1] if self._stationary else self._q[:-1]
+        margin = None
+        if margins:
+            top = -np.partition(-q, 1, axis=2)[..., :2] if self._nA > 1 else np.concatenate((q, q), axis=2)
+            margin = top[..., 0] - top[..., 1]
+        write_policy(file_name, np.argmax(q, axis=2), margin, self._stationary,
+                     {'agent': self.name, 'actions': int(self._nA), 'discount': float(self._discount)})
+
+    def greedy_policy(self):
+        """
+        Agent's current idea of what the best policy is at every step
+        :return: array of actions of shape (steps, nS)
+        """
+        if self._stationary:
+            return np.broadcast_to(np.argmax(self._q[0], axis=1), (self._nH, self._capacity))
+        return np.argmax(self._q[:-1], axis=2)
+
+    def get_stats(self, episode=None, start=0):
+        n_run = len(self._episode_rewards) - 1
+        if episode is not None and episode >= n_run and self._n_filled > 0:
+            stats = {
+                'total reward': self._filled_stats['total reward'],
+                'discounted total reward': self._filled_stats['discounted total reward'],
+                'length': self._filled_stats['episode length']
+            }
+        elif episode is not None:
             stats = {
                 'total reward': np.sum(self._episode_rewards[episode]),
                 'discounted total reward': _discounted_sum(self._episode_rewards[episode], self._discount),
@@ -85,20 +471,83 @@ class EpisodicQLearningAgent(DiscreteAgent):
                 'total reward': np.sum(rews[i]),
                 'discounted total reward': _discounted_sum(rews[i], self._discount),
                 'episode length': len(rews[i])
-            } for i in range(len(rews))]
+            } for i in range(start, len(rews))]
+            stats.extend({'episode': i, **self._filled_stats}
+                         for i in range(max(start, n_run), n_run + self._n_filled))
         return stats
 
     def _fill_q(self):
+        self._q = self._initial_q(self._capacity)
+
+    def _initial_q(self, n_states):
+        n_layers = 1 if self._stationary else self._nH + 1
         if np.isscalar(self._starting_q):
-            self._q = np.full((self._nH + 1, self._nS, self._nA), float(self._starting_q))
+            q = np.full((n_layers, n_states, self._nA), float(self._starting_q), dtype=self._q_dtype)
         else:
-            self._q = np.tile(self._starting_q, (self._nH + 1, self._nS, self._nA, 1))
-        self._q[-1] = np.zeros((self._nS, self._nA))
+            q = np.tile(self._starting_q, (n_layers, n_states, self._nA, 1)).astype(self._q_dtype)
+        if not self._stationary:
+            q[-1] = 0.0
+        return q
 
     def current_step(self):
         return self._env._elapsed_steps - 1
 
 
+def _row_events(sel, resets, next_observation, n, nA):
+    # keys (cell * (n + 1) + index) of the resets of the next step's rows by the terminal transitions in sel
+    sel = sel[resets[sel]]
+    cells = next_observation[sel, None] * nA + np.arange(nA)
+    keys = np.sort((cells * (n + 1) + sel[:, None]).reshape(-1))
+    return keys, np.zeros(len(keys))
+
+
+def _max_as_of(q, keys, values, states, index, n):
+    # the maxima of the rows q[states] as of the transitions index, given the events (cell * (n + 1) + index, value)
+    # of q. The maximum of a row is computed once after each of its events, by carrying the position of the last event
+    # of each action forward, and each transition looks up the last event of its row before it
+    nA = q.shape[1]
+    if len(keys) == 0:
+        return q.max(axis=1)[states]
+    event_cells, event_index = np.divmod(keys, n + 1)
+    event_states, event_actions = np.divmod(event_cells, nA)
+    event_keys = event_states * (n + 1) + event_index
+    by_row = np.argsort(event_keys)
+    event_keys, event_states, event_actions = event_keys[by_row], event_states[by_row], event_actions[by_row]
+    m = len(keys)
+    start = np.searchsorted(event_states, event_states)
+
+    pos = np.searchsorted(event_keys, states * (n + 1) + index) - 1
+    found = (pos >= 0) & (event_states[np.maximum(pos, 0)] == states)
+    pos = pos[found]
+    latest = np.full((m, nA), -1, dtype=np.int32 if m < np.iinfo(np.int32).max else np.int64)
+    latest[np.arange(m), event_actions] = np.arange(m)
+    np.maximum.accumulate(latest, axis=0, out=latest)
+    needed, pos = np.unique(pos, return_inverse=True)
+    latest = latest[needed]
+    row_max = np.where(latest >= start[needed, None], values[by_row][latest], q[event_states[needed]]).max(axis=1)
+
+    result = q.max(axis=1)[states]
+    result[found] = row_max[pos]
+    return result
+
+
+def _affine_scan(segments, scale, shift):
+    # inclusive scan of the compositions of the affine maps x -> scale * x + shift within each segment
+    d = 1
+    while d < len(segments):
+        same = np.zeros(len(segments), dtype=bool)
+        same[d:] = segments[d:] == segments[:-d]
+        if not same.any():
+            break
+        previous_scale, previous_shift = scale[:-d][same[d:]], shift[:-d][same[d:]]
+        shift = shift.copy()
+        shift[same] += scale[same] * previous_shift
+        scale = scale.copy()
+        scale[same] *= previous_scale
+        d *= 2
+    return scale, shift
+
+
 def _discounted_sum(rewards, discount):
     if len(rewards) == 0:
         return 0
@@ -0,0 +1,86 @@
+import numpy as np
+from gym import ObservationWrapper, Wrapper, spaces
+
+DEFAULT_CAPACITY = 64                   # initial number of states in the agents' tables
+
+
+class ObservationIndex:
+
+    def __init__(self):
+        """
+        Maps hashable observations to dense integer ids in the order they are first seen
+        """
+        self._ids = {}
+        self.observations = []
+
+    def __call__(self, observation) -> int:
+        """
+        looks the observation up and assigns it the next free id if it is new
+        :param observation: hashable observation
+        :return: the id of the observation
+        """
+        i = self._ids.get(observation)
+        if i is None:
+            i = self._ids[observation] = len(self.observations)
+            self.observations.append(observation)
+        return i
+
+    def __contains__(self, observation) -> bool:
+        return observation in self._ids
+
+    def __len__(self) -> int:
+        return len(self.observations)
+
+
+class InterningWrapper(ObservationWrapper):
+
+    def __init__(self, env, nS: int = None, capacity: int = DEFAULT_CAPACITY):
+        """
+        Replaces the observations of an environment with dense integer ids, so that the tabular agents can learn in
+        environments with tuple observations or with a reachable state set much smaller than the observation space.
+        The agents start with small tables and grow them as new states appear. Numpy arrays are interned by value.
+        Wrap the result in a TimeLimit for episodic learning.
+        :param env: environment with a discrete action space and hashable observations
+        :param nS: upper bound on the number of states; inferred from discrete and tuple observation spaces if None.
+        UCB-H and UCB-H+ use it in their confidence bounds.
+        :param capacity: initial number of states in the agents' tables
+        """
+        super().__init__(env)
+        assert isinstance(env.action_space, spaces.Discrete), 'Action space must be discrete'
+        self.nS = _space_size(env.observation_space) if nS is None else nS
+        assert self.nS is not None, 'The number of states cannot be inferred from the observation space'
+        self.nA = env.action_space.n
+        self.capacity = max(min(capacity, self.nS), 1)
+        self.index = ObservationIndex()
+        self.observation_space = spaces.Discrete(self.nS)
+
+    def observation(self, observation) -> int:
+        if isinstance(observation, np.ndarray):
+            observation = (observation.dtype.str, observation.shape, observation.tobytes())
+        return self.index(observation)
+
+
+def find_interning(env):
+    """
+    finds the interning wrapper in a chain of wrappers
+    :param env: the outermost environment
+    :return: InterningWrapper or None
+    """
+    while isinstance(env, Wrapper):
+        if isinstance(env, InterningWrapper):
+            return env
+        env = env.env
+    return None
+
+
+def _space_size(space):
+    if isinstance(space, spaces.Discrete):
+        return space.n
+    if isinstance(space, spaces.MultiBinary):
+        return 2 ** int(np.prod(space.n))
+    if isinstance(space, spaces.MultiDiscrete):
+        return int(np.prod(space.nvec))
+    if isinstance(space, spaces.Tuple):
+        sizes = [_space_size(s) for s in space.spaces]
+        return None if None in sizes else int(np.prod(sizes, dtype=object))
+    return None
@@ -1,4 +1,4 @@
-from .episodic_q_learning_agent import EpisodicQLearningAgent
+from .episodic_q_learning_agent import EpisodicQLearningAgent, DEFAULT_Q_DTYPE, DEFAULT_COUNT_DTYPE
 import numpy as np
 import math
 from .policy import UCBPolicy
@@ -9,7 +9,8 @@ class QUCBHLearningAgent(EpisodicQLearningAgent):
 
     def __init__(self,
                  env: tl.TimeLimit, name=None, verb=0, discount=None, detect_terminals=True,
-                 delta=0.001, c=0.001, num_episodes=10000):
+                 delta=0.001, c=0.001, num_episodes=10000, q_dtype=DEFAULT_Q_DTYPE, count_dtype=DEFAULT_COUNT_DTYPE,
+                 fused=False, stationary=False):
         """
         UCB-H agent
         :param env: OpenAI Gym environment; must be gym.wrappers.time_limit.TimeLimit for episodic learning
@@ -20,13 +21,19 @@ class QUCBHLearningAgent(EpisodicQLearningAgent):
         :param delta: PAC-probability delta
         :param c: UCB-constant c
         :param num_episodes: number of episodes to run
+        :param q_dtype: floating point type of the Q-table
+        :param count_dtype: integer type of the visit counts
+        :param fused: whether to run the episodes in a single fused loop
+        :param stationary: whether to learn a single Q-table for all time steps; requires a discount below 1
         """
         policy = UCBPolicy()
-        H = env._max_episode_steps
+        # a stationary agent uses the effective horizon of the discounted problem
+        H = 1.0 / (1.0 - discount) if stationary and discount is not None and discount < 1 else env._max_episode_steps
         assert env.reward_range[1] < float('inf') and env.reward_range[0] > float('-inf'),\
             'environment must have a finite reward range for UCB-learning to work.'
         starting_q = env.reward_range[1] * H
-        super().__init__(env, policy, name, verb, discount, starting_q, detect_terminals)
+        super().__init__(env, policy, name, verb, discount, starting_q, detect_terminals,
+                         q_dtype=q_dtype, count_dtype=count_dtype, fused=fused, stationary=stationary)
         self._H = H
         self._c = c
         self._delta = delta
@@ -34,22 +41,32 @@ class QUCBHLearningAgent(EpisodicQLearningAgent):
         self._iota = math.log(self._nS * self._nA * self._H * self._K / self._delta)
         self._reward_range = env.reward_range[1] - env.reward_range[0]
 
-    def _learn(self, observation, action, next_observation, reward, done, info):
+    def _update(self, step, observation, action, next_observation, reward, done):
+        i, j = self._layers(step)
+
         # if agent knows how to detect terminals, use zero Q-value for the next state value
-        step = self.current_step()
         if done and self._detect_terminals:
             next_q = 0.0
-            self._q[step + 1][next_observation] = np.zeros((self._nA,))
+            self._q[j, next_observation] = 0.0
         else:
-            next_q = float(min(max(self._q[step+1][next_observation]), self._starting_q))
+            next_q = float(min(self._q[j, next_observation].max(), self._starting_q))
 
         # update the Q-table
-        t = self._n_visits[step][observation][action]
+        t = int(self._n_visits[i, observation, action])
         bonus = self._c * self._reward_range * math.sqrt(8 * self._H * self._iota / t)
-        update = reward + self._discount * next_q + bonus - self._q[step][observation][action]
+        update = reward + self._discount * next_q + bonus - self._q[i, observation, action]
         alpha = self._alpha(t)
-        self._q[step][observation][action] += alpha * update
+        self._q[i, observation, action] += alpha * update
+
+    def _terms(self, step, t):
+        return self._alpha(t), self._c * self._reward_range * np.sqrt(8 * self._H * self._iota / t)
+
+    def _next_bound(self):
+        return self._starting_q
+
+    def _resets_terminals(self):
+        return True
 
     def learned_policy(self):
-        step = self.current_step()
-        return [np.argmax(self._q[step][state]) for state in range(self._nS)]
+        step = self._layers(self.current_step())[0]
+        return [np.argmax(self._q[step][state]) for state in range(self._capacity)]
@@ -1,4 +1,5 @@
 from . import QUCBHLearningAgent
+from .episodic_q_learning_agent import DEFAULT_Q_DTYPE, DEFAULT_COUNT_DTYPE
 import numpy as np
 import math
 import gym.wrappers.time_limit as tl
@@ -10,6 +11,7 @@ class QUCBHPlusLearningAgent(QUCBHLearningAgent):
                  env: tl.TimeLimit, name=None, verb=0, discount=None,
                  detect_terminals=True,
                  delta=0.001, c=0.001, num_episodes=10000, lam=1.0, omega=0.8,
+                 q_dtype=DEFAULT_Q_DTYPE, count_dtype=DEFAULT_COUNT_DTYPE, fused=False, stationary=False
                  ):
         """
         UCB-H+ agent
@@ -23,34 +25,53 @@ class QUCBHPlusLearningAgent(QUCBHLearningAgent):
         :param num_episodes: number of episodes to run
         :param lam: lambda coefficient for the learning rate
         :param omega: power coefficient for the learning rate
+        :param q_dtype: floating point type of the Q-table
+        :param count_dtype: integer type of the visit counts
+        :param fused: whether to run the episodes in a single fused loop
+        :param stationary: whether to learn a single Q-table for all time steps; requires a discount below 1
         """
-        super().__init__(env, name, verb, discount, detect_terminals, delta, c, num_episodes)
+        super().__init__(env, name, verb, discount, detect_terminals, delta, c, num_episodes, q_dtype, count_dtype,
+                         fused, stationary)
         self._lambdaH = lam * self._H
         self._omega = omega
         self._alpha = lambda t: ((self._lambdaH + 1.0) / (self._lambdaH + t ** self._omega))
 
-    def _learn(self, observation, action, next_observation, reward, done, info):
+    def _update(self, step, observation, action, next_observation, reward, done):
+        i, j = self._layers(step)
+
         # if agent knows how to detect terminals, use zero Q-value for the next state value
-        step = self.current_step()
         if done and self._detect_terminals:
             next_q = 0.0
-            self._q[step + 1][next_observation] = np.zeros((self._nA,))
+            self._q[j, next_observation] = 0.0
         else:
-            next_q = float(min(max(self._q[step+1][next_observation]), self._starting_q))
+            next_q = float(min(self._q[j, next_observation].max(), self._starting_q))
 
         # update the Q-table
-        t = self._n_visits[step][observation][action]
-        v_next = self._reward_range * (self._H - step + 1 if self._discount == 1 else
-                                       (1 - self._discount ** (self._H - step + 1))/(1 - self._discount))
+        t = int(self._n_visits[i, observation, action])
+        v_next = self._v_next(step)
         alpha = self._alpha(t)
         bonus = 1.0 / alpha * self._bonus_base(t) + (1.0 - 1.0 / alpha) * self._bonus_base(t - 1)
         bonus *= self._c * v_next * self._discount * math.sqrt(self._iota)
-        update = reward + self._discount * next_q + bonus - self._q[step][observation][action]
-        self._q[step][observation][action] += alpha * update
+        update = reward + self._discount * next_q + bonus - self._q[i, observation, action]
+        self._q[i, observation, action] += alpha * update
+
+    def _terms(self, step, t):
+        alpha = self._alpha(t)
+        bonus = 1.0 / alpha * self._bonus_bases(t) + (1.0 - 1.0 / alpha) * self._bonus_bases(t - 1)
+        return alpha, bonus * self._c * self._v_next(step) * self._discount * math.sqrt(self._iota)
+
+    def _v_next(self, step):
+        if self._stationary:
+            return self._reward_range * self._H
+        return self._reward_range * (self._H - step + 1 if self._discount == 1 else
+                                     (1 - self._discount ** (self._H - step + 1))/(1 - self._discount))
 
     def _bonus_base(self, t):
         return 1.0 / math.sqrt((self._lambdaH + t) ** self._omega)
 
+    def _bonus_bases(self, t):
+        return 1.0 / np.sqrt((self._lambdaH + t) ** self._omega)
+
     def learned_policy(self):
-        step = self.current_step()
-        return [np.argmax(self._q[step][state]) for state in range(self._nS)]
+        step = self._layers(self.current_step())[0]
+        return [np.argmax(self._q[step][state]) for state in range(self._capacity)]
@@ -4,19 +4,20 @@ import numpy as np
 
 class SimpleQLearningAgent(EpisodicQLearningAgent):
 
-    def _learn(self, observation, action, next_observation, reward, done, info):
+    def _update(self, step, observation, action, next_observation, reward, done):
+        step, next_step = self._layers(step)
+
         # if agent knows how to detect terminals, use zero Q-value for the next state value
-        step = self._env._elapsed_steps - 1
         if done and self._detect_terminals:
             next_q = 0.0
         else:
-            next_q = max(self._q[step+1][next_observation])
+            next_q = self._q[next_step, next_observation].max()
 
         # update the Q-table
-        update = reward + self._discount * next_q - self._q[step][observation][action]
-        alpha = self._alpha(self._n_visits[step][observation][action])
-        self._q[step][observation][action] += alpha * update
+        update = reward + self._discount * next_q - self._q[step, observation, action]
+        alpha = self._alpha(int(self._n_visits[step, observation, action]))
+        self._q[step, observation, action] += alpha * update
 
     def learned_policy(self):
-        step = self._env._elapsed_steps - 1
-        return [np.argmax(self._q[step][state]) for state in range(self._nS)]
+        step = self._layers(self._env._elapsed_steps - 1)[0]
+        return [np.argmax(self._q[step][state]) for state in range(self._capacity)]
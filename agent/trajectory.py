@@ -0,0 +1,87 @@
+import os
+import numpy as np
+
+DEFAULT_CHUNK_SIZE = 1 << 16            # number of transitions buffered before writing to the disk
+MAGIC = b'UCBHTRJ1'
+HEADER_SIZE = 16
+
+
+def transition_dtype(reward_dtype=np.float64) -> np.dtype:
+    """
+    record type of a single transition
+    :param reward_dtype: type of the rewards
+    :return: numpy dtype with fields h, s, a, r, next, and done
+    """
+    return np.dtype([('h', '<i4'), ('s', '<i4'), ('a', '<i4'), ('r', np.dtype(reward_dtype).newbyteorder('<')),
+                     ('next', '<i4'), ('done', '?')])
+
+
+class TrajectoryRecorder:
+
+    def __init__(self, file_name: str, chunk_size: int = DEFAULT_CHUNK_SIZE, reward_dtype=np.float64):
+        """
+        Records every transition (h, s, a, r, s', done) into a preallocated typed buffer that is appended to
+        a binary file in large chunks. The episodes start where h is 0.
+        :param file_name: file to write the transitions to
+        :param chunk_size: number of transitions buffered before writing to the disk
+        :param reward_dtype: type of the rewards, float64 like the rewards of the environments by default; with a
+        smaller type, e.g., numpy.float32, the tables are only reproduced exactly by replay() if the rewards are
+        representable in it
+        """
+        self._dtype = transition_dtype(reward_dtype)
+        self._buffer = np.empty(max(chunk_size, 1), dtype=self._dtype)
+        self._n = 0
+        self._file = open(file_name, 'wb')
+        self._file.write(MAGIC + self._dtype['r'].str.encode().ljust(HEADER_SIZE - len(MAGIC)))
+
+    def append(self, h, observation, action, reward, next_observation, done):
+        """
+        records a single transition
+        :param h: time step
+        :param observation: current observation
+        :param action: chosen action
+        :param reward: reward received
+        :param next_observation: new observation after taking the chosen action
+        :param done: is the episode done?
+        """
+        self._buffer[self._n] = (h, observation, action, reward, next_observation, done)
+        self._n += 1
+        if self._n == len(self._buffer):
+            self.flush()
+
+    def flush(self):
+        """
+        writes the buffered transitions to the disk
+        """
+        self._buffer[:self._n].tofile(self._file)
+        self._file.flush()
+        self._n = 0
+
+    def close(self):
+        """
+        writes the buffered transitions to the disk and closes the file
+        """
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def load_trajectory(file_name: str) -> np.ndarray:
+    """
+    opens recorded transitions without loading them into the memory
+    :param file_name: file with the recorded transitions
+    :return: read-only memory-mapped structured array with fields h, s, a, r, next, and done
+    """
+    with open(file_name, 'rb') as f:
+        header = f.read(HEADER_SIZE)
+    assert header[:len(MAGIC)] == MAGIC, f'{file_name} is not a trajectory file'
+    dtype = transition_dtype(header[len(MAGIC):].decode().strip())
+    if os.path.getsize(file_name) == HEADER_SIZE:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(file_name, dtype=dtype, mode='r', offset=HEADER_SIZE)
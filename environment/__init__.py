@@ -1,9 +1,35 @@
 from .frozen_lake import FrozenLakeAdjustableEnv
 from .replacement import ReplacementEnv
-from gym.envs.registration import register
+from .garnet import GarnetEnv
+from gym.envs.registration import register, registry
 
 
-__all__ = ['FrozenLakeAdjustableEnv', 'ReplacementEnv']
+__all__ = ['FrozenLakeAdjustableEnv', 'ReplacementEnv', 'GarnetEnv', 'register_garnet']
+
+GARNET_STATES = (10, 100, 1000, 10000, 100000)
+GARNET_ACTIONS = (2, 5, 10)
+GARNET_BRANCHING = (2, 5)
+
+
+def register_garnet(nS: int, nA: int, branching: int, **kwargs) -> str:
+    """
+    registers a Garnet MDP of the given size in the OpenAI Gym as Garnet-{nS}-{nA}-{branching}-v0
+    :param nS: number of states
+    :param nA: number of actions
+    :param branching: number of possible next states of each state-action pair
+    :param kwargs: other arguments of GarnetEnv, e.g., seed or max_episode_steps
+    :return: the environment's id
+    """
+    env_id = f'Garnet-{nS}-{nA}-{branching}-v0'
+    if env_id not in registry.env_specs:
+        register(
+            id=env_id,
+            entry_point='environment.garnet:GarnetEnv',
+            nondeterministic=False,
+            kwargs={'nS': nS, 'nA': nA, 'branching': branching, **kwargs}
+        )
+    return env_id
+
 
 register(
     id='Replacement-v0',
@@ -20,3 +46,8 @@ register(
     nondeterministic=False,
     kwargs={'map_name': '8x8', 'p_follow': 1.0, 'max_episode_steps': 16}
 )
+
+for nS in GARNET_STATES:
+    for nA in GARNET_ACTIONS:
+        for branching in GARNET_BRANCHING:
+            register_garnet(nS, nA, branching)
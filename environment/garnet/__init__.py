@@ -0,0 +1,4 @@
+from .garnet_env import GarnetEnv
+
+
+__all__ = ['GarnetEnv']
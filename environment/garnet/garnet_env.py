@@ -0,0 +1,120 @@
+import hashlib
+from collections.abc import Mapping
+
+import gym.envs.toy_text.discrete as discrete
+import gym.wrappers.time_limit as tl
+import numpy as np
+
+DEFAULT_NUM_STATES = 100
+DEFAULT_NUM_ACTIONS = 5
+DEFAULT_BRANCHING = 5                   # number of possible next states of each state-action pair
+DEFAULT_REWARD_DENSITY = 1.0            # fraction of state-action pairs with a nonzero reward
+DEFAULT_MAX_EPISODE_STEPS = 20
+
+
+class GarnetEnv(tl.TimeLimit):
+    def __init__(self, nS=DEFAULT_NUM_STATES, nA=DEFAULT_NUM_ACTIONS, branching=DEFAULT_BRANCHING,
+                 reward_density=DEFAULT_REWARD_DENSITY, seed=0, s0=None,
+                 max_episode_steps=DEFAULT_MAX_EPISODE_STEPS):
+        super().__init__(_GarnetEnv(nS, nA, branching, reward_density, seed, s0), max_episode_steps)
+        self.P = self.env.P
+        self.isd = self.env.isd
+        self.nS = self.env.nS
+        self.nA = self.env.nA
+        self._max_episode_steps = max_episode_steps
+
+
+class _GarnetEnv(discrete.DiscreteEnv):
+    """
+    Random MDP of the Garnet family: every state-action pair leads to `branching` distinct next states chosen
+    uniformly at random, with probabilities drawn uniformly from the simplex, and yields a reward uniform in [0, 1]
+    with probability `reward_density` and 0 otherwise. The model is generated with vectorized numpy from `seed`;
+    P is built row by row from it when a row is first accessed.
+    """
+    def __init__(self, nS=DEFAULT_NUM_STATES, nA=DEFAULT_NUM_ACTIONS, branching=DEFAULT_BRANCHING,
+                 reward_density=DEFAULT_REWARD_DENSITY, seed=0, s0=None):
+
+        assert 1 <= branching <= nS, 'Branching factor must be between 1 and the number of states'
+        assert 0.0 <= reward_density <= 1.0, 'Reward density must be between 0 and 1'
+        rng = np.random.RandomState(seed)
+
+        # distinct next states of each pair by Floyd's sampling, vectorized over the pairs
+        next_states = np.empty((nS * nA, branching), dtype=np.int64)
+        for k, j in enumerate(range(nS - branching, nS)):
+            t = rng.randint(0, j + 1, size=nS * nA)
+            taken = (next_states[:, :k] == t[:, None]).any(axis=1)
+            next_states[:, k] = np.where(taken, j, t)
+        self.next_states = np.sort(next_states, axis=1).reshape(nS, nA, branching)
+        self.probabilities = rng.dirichlet(np.ones(branching), size=(nS, nA))
+        rewards = rng.uniform(0.0, 1.0, size=(nS, nA))
+        self.rewards = np.where(rng.uniform(size=(nS, nA)) < reward_density, rewards, 0.0)
+
+        if s0 is None:
+            isd = np.full(nS, 1.0 / nS)
+        else:
+            isd = np.zeros(nS)
+            isd[s0] = 1.0
+        super().__init__(nS, nA, _GarnetTransitions(self.next_states, self.probabilities, self.rewards), isd)
+
+        self.reward_range = (0.0, 1.0)
+
+    def sparse_model(self):
+        """
+        the model's arrays for process_results.solve_sparse()
+        :return: (next states, probabilities, rewards) of shapes (nS, nA, branching), (nS, nA, branching), and (nS, nA)
+        """
+        return self.next_states, self.probabilities, self.rewards
+
+    def dense_model(self):
+        """
+        builds the dense transition and reward tensors directly from the model's arrays,
+        see process_results.compile_model()
+        :return: (transitions, rewards), both of shape (nA, nS + 1, nS + 1)
+        """
+        nS, nA, branching = self.next_states.shape
+        t = np.zeros((nA, nS + 1, nS + 1))
+        r = np.zeros((nA, nS + 1, nS + 1))
+        a, s, _ = np.meshgrid(np.arange(nA), np.arange(nS), np.arange(branching), indexing='ij')
+        s_p = np.swapaxes(self.next_states, 0, 1)
+        t[a, s, s_p] = np.swapaxes(self.probabilities, 0, 1)
+        r[a, s, s_p] = np.swapaxes(self.rewards, 0, 1)[..., None]
+        t[:, :nS, :] /= np.sum(t[:, :nS, :], axis=2, keepdims=True)
+        t[:, nS, nS] = 1.0
+        return t, r
+
+
+class _GarnetTransitions(Mapping):
+    """
+    P of a Garnet MDP in the format of DiscreteEnv, built from the model's arrays one state at a time
+    """
+    def __init__(self, next_states, probabilities, rewards):
+        self._next_states = next_states
+        self._probabilities = probabilities
+        self._rewards = rewards
+        self._rows = {}
+
+    def __getitem__(self, s):
+        row = self._rows.get(s)
+        if row is None:
+            if not 0 <= s < len(self._next_states):
+                raise KeyError(s)
+            row = self._rows[s] = {
+                a: [(p, s_p, r, False) for p, s_p in zip(probabilities, next_states)]
+                for a, (probabilities, next_states, r) in enumerate(zip(self._probabilities[s].tolist(),
+                                                                        self._next_states[s].tolist(),
+                                                                        self._rewards[s].tolist()))
+            }
+        return row
+
+    def __iter__(self):
+        return iter(range(len(self._next_states)))
+
+    def __len__(self):
+        return len(self._next_states)
+
+    def __repr__(self):
+        # identifies the model by its contents, e.g., for process_results.ModelCache
+        digest = hashlib.sha256()
+        for array in (self._next_states, self._probabilities, self._rewards):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return f'GarnetTransitions({digest.hexdigest()})'
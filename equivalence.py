@@ -0,0 +1,261 @@
+import argparse
+import sys
+import time
+import numpy as np
+import scipy.stats as st
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_EPISODES = 500
+DEFAULT_TRIALS = 20
+DEFAULT_ALPHA = 0.01                    # significance level of the distributional tests
+DEFAULT_TOLERANCE = 3.0                 # allowed difference of the mean curves in standard errors
+DEFAULT_ROUNDING = 1e-9                 # allowed difference of the Q-tables learned by ingest()
+STATIONARY_DISCOUNT = 0.9               # discount of the stationary agents in the ingestion checks
+DEFAULT_ENVS = ('Lake-v0', 'Replacement-v0', 'Garnet-10-5-5-v0')
+DEFAULT_STEPS = {'Lake-v0': 16, 'Replacement-v0': 8, 'Garnet-10-5-5-v0': 10}
+STAT = 'total reward'
+
+
+def make_env(name: str, steps: Optional[int] = None):
+    """
+    builds a fresh environment for a comparison
+    :param name: name of a registered environment, e.g., 'Garnet-10-5-5-v0' for a small random MDP
+    :param steps: number of steps per episode
+    :return: the environment wrapped in a TimeLimit
+    """
+    import run
+
+    steps = DEFAULT_STEPS.get(name) if steps is None else steps
+    env, _, _ = run.make_env(name, steps)
+    return env
+
+
+def reference_agents() -> Dict[str, Callable]:
+    """
+    factories of the reference agents as they are used in run()
+    :return: a dictionary of functions that build an agent given an environment and optional keyword arguments
+    """
+    import agent
+
+    def q_max(env, **kwargs):
+        policy = agent.policy.EpsilonGreedyPolicy(1.0, 0.99, 0.0)
+        return agent.SimpleQLearningAgent(env=env, policy=policy, name='Q_max',
+                                          starting_q=float(env.reward_range[1]) * env._max_episode_steps, **kwargs)
+
+    return {
+        'QUCBPlus': lambda env, **kwargs: agent.QUCBHPlusLearningAgent(env=env, name='QUCBPlus', c=0.001, **kwargs),
+        'QUCB': lambda env, **kwargs: agent.QUCBHLearningAgent(env=env, name='QUCB', c=0.001, **kwargs),
+        'Q_max': q_max
+    }
+
+
+# candidate execution engines: each one maps a reference factory to a candidate factory
+CANDIDATES = {
+    'reference': lambda factory: factory,
+    'float32': lambda factory: lambda env: factory(env, q_dtype=np.float32, count_dtype=np.uint32),
+    'fused': lambda factory: lambda env: factory(env, fused=True),
+}
+# candidates that change the rounding; their trajectories diverge with a shared seed, so only the distributions are
+# compared
+INEXACT_CANDIDATES = ('float32',)
+
+
+def _execute(factory: Callable, env_name: str, episodes: int, seed: int):
+    from run import set_seed
+
+    env = make_env(env_name)
+    set_seed(env, seed)
+    learner = factory(env)
+    start = time.perf_counter()
+    learner.run(episodes)
+    elapsed = time.perf_counter() - start
+    curve = np.array([stats[STAT] for stats in learner.get_stats()], dtype=float)
+    return curve, learner.get_tables(), elapsed
+
+
+def compare_exact(reference: Callable, candidate: Callable, env_name: str, episodes: int = DEFAULT_EPISODES,
+                  seed: int = 0) -> Dict[str, Any]:
+    """
+    runs the reference and the candidate with a shared seed and requires exactly equal results
+    :param reference: function that builds the reference agent given an environment
+    :param candidate: function that builds the candidate agent given an environment
+    :param env_name: environment, see make_env()
+    :param episodes: number of episodes
+    :param seed: the shared seed
+    :return: a dictionary with the verdict 'passed', the largest differences of the curves and the tables,
+    and the 'speedup' of the candidate
+    """
+    ref_curve, ref_tables, ref_time = _execute(reference, env_name, episodes, seed)
+    cand_curve, cand_tables, cand_time = _execute(candidate, env_name, episodes, seed)
+    curve_diff = float(np.max(np.abs(ref_curve - cand_curve)))
+    q_diff = float(np.max(np.abs(ref_tables['q'] - cand_tables['q'].astype(ref_tables['q'].dtype))))
+    visits_equal = np.array_equal(ref_tables['n_visits'], cand_tables['n_visits'])
+    return {
+        'passed': curve_diff == 0 and q_diff == 0 and visits_equal,
+        'curve difference': curve_diff,
+        'q difference': q_diff,
+        'visits equal': visits_equal,
+        'speedup': ref_time / cand_time if cand_time > 0 else float('inf')
+    }
+
+
+def compare_ingest(reference: Callable, env_name: str, episodes: int = DEFAULT_EPISODES, seed: int = 0,
+                   stationary: bool = False, rounding: float = DEFAULT_ROUNDING) -> Dict[str, Any]:
+    """
+    records the transitions of a reference agent's run, learns from them with ingest() in a fresh agent, and requires
+    the same visit counts and the same Q-table up to floating-point rounding
+    :param reference: function that builds the reference agent given an environment
+    :param env_name: environment, see make_env()
+    :param episodes: number of episodes
+    :param seed: seed of the run
+    :param stationary: whether to check stationary agents
+    :param rounding: allowed difference of the Q-tables
+    :return: a dictionary with the verdict 'passed', the largest difference of the Q-tables, and the speedup of
+    ingest() over the run
+    """
+    from run import set_seed
+
+    kwargs = {'discount': STATIONARY_DISCOUNT, 'stationary': True} if stationary else {}
+    env = make_env(env_name)
+    set_seed(env, seed)
+    learner = reference(env, **kwargs)
+    transitions = _TransitionList()
+    learner.set_trajectory_recorder(transitions)
+    start = time.perf_counter()
+    learner.run(episodes)
+    run_time = time.perf_counter() - start
+
+    ingester = reference(make_env(env_name), **kwargs)
+    start = time.perf_counter()
+    ingester.ingest(*transitions.arrays())
+    ingest_time = time.perf_counter() - start
+
+    tables, ingested = learner.get_tables(), ingester.get_tables()
+    q_diff = float(np.max(np.abs(tables['q'] - ingested['q'])))
+    visits_equal = np.array_equal(tables['n_visits'], ingested['n_visits'])
+    return {
+        'passed': q_diff <= rounding and visits_equal,
+        'q difference': q_diff,
+        'visits equal': visits_equal,
+        'speedup': run_time / ingest_time if ingest_time > 0 else float('inf')
+    }
+
+
+class _TransitionList:
+
+    def __init__(self):
+        self._transitions = []
+
+    def append(self, h, s, a, r, s_next, done):
+        self._transitions.append((h, s, a, r, s_next, done))
+
+    def arrays(self):
+        return [np.array(column) for column in zip(*self._transitions)]
+
+
+def compare_distribution(reference: Callable, candidate: Callable, env_name: str, episodes: int = DEFAULT_EPISODES,
+                         trials: int = DEFAULT_TRIALS, alpha: float = DEFAULT_ALPHA,
+                         tolerance: float = DEFAULT_TOLERANCE) -> Dict[str, Any]:
+    """
+    runs the reference and the candidate with independent seeds and compares the distributions of their results:
+    a two-sample Kolmogorov-Smirnov test on the mean rewards of the trials and a bound on the difference of
+    the mean learning curves in standard errors
+    :param reference: function that builds the reference agent given an environment
+    :param candidate: function that builds the candidate agent given an environment
+    :param env_name: environment, see make_env()
+    :param episodes: number of episodes
+    :param trials: number of trials of each of the agents
+    :param alpha: significance level of the KS-test
+    :param tolerance: allowed difference of the mean curves in standard errors
+    :return: a dictionary with the verdict 'passed', the 'p-value' of the KS-test, the largest difference of
+    the mean curves in standard errors, and the 'speedup' of the candidate
+    """
+    ref = [_execute(reference, env_name, episodes, 2 * trial) for trial in range(trials)]
+    cand = [_execute(candidate, env_name, episodes, 2 * trial + 1) for trial in range(trials)]
+    ref_curves = np.array([curve for curve, _, _ in ref])
+    cand_curves = np.array([curve for curve, _, _ in cand])
+
+    p_value = st.ks_2samp(ref_curves.mean(axis=1), cand_curves.mean(axis=1)).pvalue
+
+    # compare the mean curves over blocks of episodes to smooth out the per-episode noise
+    blocks = np.array_split(np.arange(episodes), min(episodes, 20))
+    ref_blocks = np.stack([ref_curves[:, b].mean(axis=1) for b in blocks], axis=1)
+    cand_blocks = np.stack([cand_curves[:, b].mean(axis=1) for b in blocks], axis=1)
+    se = np.sqrt(st.sem(ref_blocks, axis=0) ** 2 + st.sem(cand_blocks, axis=0) ** 2)
+    diff = np.abs(ref_blocks.mean(axis=0) - cand_blocks.mean(axis=0))
+    z = float(np.max(np.where(se > 0, diff / np.where(se > 0, se, 1.0), np.where(diff > 0, np.inf, 0.0))))
+
+    ref_time = sum(elapsed for _, _, elapsed in ref)
+    cand_time = sum(elapsed for _, _, elapsed in cand)
+    return {
+        'passed': p_value >= alpha and z <= tolerance,
+        'p-value': float(p_value),
+        'curve difference (se)': z,
+        'speedup': ref_time / cand_time if cand_time > 0 else float('inf')
+    }
+
+
+def check(candidate: str, envs: List[str] = DEFAULT_ENVS, episodes: int = DEFAULT_EPISODES,
+          trials: int = DEFAULT_TRIALS, exact: bool = True, distribution: bool = True, ingest: bool = False,
+          verbose: int = 0) -> List[Dict[str, Any]]:
+    """
+    checks a candidate execution engine against all reference agents in the given environments
+    :param candidate: name of the candidate, see CANDIDATES
+    :param envs: environments, see make_env()
+    :param episodes: number of episodes
+    :param trials: number of trials for the distributional tests
+    :param exact: whether to require exact equality with a shared seed; skipped for INEXACT_CANDIDATES
+    :param distribution: whether to run the distributional tests with independent seeds
+    :param ingest: whether to also check ingest() against the reference agents' runs, with and without stationary
+    tables
+    :param verbose: verbosity
+    :return: a list of reports, one per environment, agent and test
+    """
+    reports = []
+    for env_name in envs:
+        for agent_name, reference in reference_agents().items():
+            engine = CANDIDATES[candidate](reference)
+            tests = []
+            if exact and candidate not in INEXACT_CANDIDATES:
+                tests.append(('exact', lambda: compare_exact(reference, engine, env_name, episodes)))
+            if distribution:
+                tests.append(('distribution', lambda: compare_distribution(reference, engine, env_name, episodes,
+                                                                           trials)))
+            if ingest:
+                tests.append(('ingest', lambda: compare_ingest(reference, env_name, episodes)))
+                tests.append(('ingest stationary', lambda: compare_ingest(reference, env_name, episodes,
+                                                                          stationary=True)))
+            for test, compare in tests:
+                report = {'env': env_name, 'agent': agent_name, 'test': test, **compare()}
+                if verbose >= 1:
+                    print(', '.join(f'{k}: {v:.4g}' if isinstance(v, float) else f'{k}: {v}'
+                                    for k, v in report.items()))
+                reports.append(report)
+    return reports
+
+
+def parse_args():
+    """
+    parse the command line arguments
+    :return: (dict) the arguments
+    """
+    parser = argparse.ArgumentParser(description='Check that a candidate execution engine matches the reference '
+                                                 'UCB-H+, UCB-H, and Q-Learning agents')
+    parser.add_argument('candidate', help='Candidate engine', choices=list(CANDIDATES))
+    parser.add_argument('--envs', help='Environments to check in', nargs='+', default=list(DEFAULT_ENVS))
+    parser.add_argument('--episodes', help='Number of episodes', type=int, default=DEFAULT_EPISODES)
+    parser.add_argument('--trials', help='Number of trials for the distributional tests', type=int,
+                        default=DEFAULT_TRIALS)
+    parser.add_argument('--no-exact', help='Skip the tests with shared seeds', dest='exact', action='store_false')
+    parser.add_argument('--ingest', help='Also check the batched ingestion of transitions', action='store_true')
+    parser.add_argument('--no-distribution', help='Skip the tests with independent seeds', dest='distribution',
+                        action='store_false')
+    return vars(parser.parse_args())
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    reports = check(**args, verbose=1)
+    failed = [report for report in reports if not report['passed']]
+    print(f'{len(reports) - len(failed)}/{len(reports)} checks passed.')
+    sys.exit(1 if failed else 0)
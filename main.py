@@ -35,6 +35,15 @@ def parse_args():
     parser.add_argument('--omega', help='Exploration rate power coefficient (omega) for UCB-H+, see eq. (14)',
                         type=float)
 
+    parser.add_argument('--q_dtype', help='Floating point type of the Q-tables', choices=['float64', 'float32'])
+    parser.add_argument('--count_dtype', help='Integer type of the visit counts; the counts saturate at its maximum',
+                        choices=['int64', 'uint32', 'uint16'])
+
+    parser.add_argument('--plan', help='Only predict the memory footprint and the wall time of the run',
+                        action='store_true')
+    parser.add_argument('--calibration', help='Seconds to run the agents for when planning', type=float,
+                        default=2.0)
+
     parser.add_argument('-v', '--verbose', help='increase output verbosity', action='count')
 
     parser.add_argument('--save', help='Save the results into a csv-file', dest='save', action='store_true')
@@ -42,12 +51,67 @@ def parse_args():
     parser.set_defaults(save=True)
     parser.add_argument('--save_dir', help='Directory to save the results', type=str)
 
+    parser.add_argument('--record', help='Record every episode (full), or only the first episodes and then a pyramid '
+                                         'of block aggregates with fixed or geometrically growing blocks',
+                        choices=['full', 'fixed', 'geometric'])
+    parser.add_argument('--record_window', help='Number of episodes recorded individually', type=int)
+    parser.add_argument('--record_block', help='Number of episodes in the finest blocks', type=int)
+    parser.add_argument('--record_levels', help='Number of levels in the pyramid of block aggregates', type=int)
+
     parser.add_argument('--plot', help='Plot the results with matplotlib', dest='plot', action='store_true')
     parser.add_argument('--no-plot', help='Do not plot the results', dest='plot', action='store_false')
     parser.set_defaults(plot=True)
     parser.add_argument('--smoothing', help='Percentage of episode to smooth plots over', type=float)
     parser.add_argument('--iqr', help='Interquantile range to plot, from 0.0 to 1.0', type=float)
 
+    parser.add_argument('--fused', help='Run the episodes in a single fused loop; the results are identical',
+                        action='store_true')
+
+    parser.add_argument('--stationary', help='Learn a single Q-table for all time steps; requires a discount below 1',
+                        action='store_true')
+    parser.add_argument('--intern_observations', help='Map the observations to dense ids on first sight and grow '
+                        'the tables with the states seen', action='store_true')
+    parser.add_argument('--num_states', help='Upper bound on the number of states of an interned environment',
+                        type=int)
+
+    parser.add_argument('--writer_queue', help='Maximum number of result blocks waiting to be saved', type=int)
+    parser.add_argument('--flush_interval', help='Maximum time in seconds between writes to the results file',
+                        type=float)
+    parser.add_argument('--durability', help='How hard to push the results to the disk after every write',
+                        choices=['none', 'flush', 'fsync'])
+
+    parser.add_argument('--history_dir', help='Record snapshots of the Q-tables and visit counts into this directory',
+                        type=str)
+    parser.add_argument('--history_every', help='Number of episodes between the snapshots', type=int)
+    parser.add_argument('--history_dtype', help='Storage type of the recorded Q-values',
+                        choices=['float16', 'float32'])
+    parser.add_argument('--history_min_delta', help='Skip snapshots that changed less than this', type=float)
+
+    parser.add_argument('--policy_dir', help='Export the learned policies into this directory', type=str)
+
+    parser.add_argument('--trajectory_dir', help='Record every transition of every agent into this directory',
+                        type=str)
+
+    parser.add_argument('--early_stopping', help='Stop the agents once their greedy policies have converged',
+                        action='store_true')
+    parser.add_argument('--stopping_epsilon', help='Allowed gap between the converged policy and the optimum',
+                        type=float)
+    parser.add_argument('--stopping_window', help='Number of episodes the greedy policy must stay near-optimal',
+                        type=int)
+    parser.add_argument('--stopping_every', help='Number of episodes between the convergence checks', type=int)
+
+    parser.add_argument('--time_budget', help='Wall time in seconds the run may take; partial results are kept',
+                        type=float)
+    parser.add_argument('--chunk', help='Number of episodes each agent runs before the next one takes over', type=int)
+
+    parser.add_argument('--metrics_port', help='Serve operational metrics in the Prometheus text format on this port',
+                        type=int)
+    parser.add_argument('--metrics_file', help='Periodically write operational metrics to this file', type=str)
+
+    parser.add_argument('--cache_dir', help='Directory to cache compiled models and solutions in', type=str)
+    parser.add_argument('--cache_size', help='Maximum size of the cache in megabytes', type=float)
+    parser.add_argument('--clear_cache', help='Clear the cache before running', action='store_true')
+
     args = parser.parse_args()
     dict_args = vars(args)
     return dict_args
@@ -59,10 +123,16 @@ if __name__ == '__main__':
     env_name = args['env']
     with open('defaults.yml') as f:
         defaults = yaml.safe_load(f)
+    env_defaults = defaults[env_name] if env_name in defaults else defaults.get(env_name.split('-')[0], {})
     for key, value in args.items():
         if value is None:
-            # print(f'"{key}" unspecified. Using the default value: {defaults[env_name][key]}')
-            args[key] = defaults[env_name].get(key)
+            # print(f'"{key}" unspecified. Using the default value: {env_defaults[key]}')
+            args[key] = env_defaults.get(key)
 
-    # Run the actual script.
-    run(**args)
+    # Run the actual script or only plan it.
+    plan_only, calibration = args.pop('plan'), args.pop('calibration')
+    if plan_only:
+        from plan import plan
+        plan(**args, calibration=calibration)
+    else:
+        run(**args)
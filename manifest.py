@@ -0,0 +1,171 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import yaml
+from typing import Any, Dict, List, Optional
+
+DEFAULT_DEFAULTS_FILE = 'defaults.yml'
+JOB_FILE = 'job.yml'
+
+# run() arguments that do not affect the results and are therefore ignored when comparing jobs
+IGNORED_KEYS = ('verbose', 'save', 'save_dir', 'plot', 'iqr', 'cache_dir', 'cache_size', 'clear_cache', 'run_name')
+# run() arguments that only affect the results when block aggregates are recorded
+AGGREGATE_KEYS = ('smoothing',)
+
+
+def load_manifest(file_name: str) -> Dict[str, Any]:
+    """
+    loads an experiment manifest. A manifest is a yaml-file of the following form:
+
+        save_dir: results
+        experiments:
+          - env: Lake-v0
+            kwargs: {p_follow: 0.8}
+            methods: [QUCBPlus, QUCB]
+            trials: 5
+            seeds: [0, 1, 2]
+            params:
+              episodes: 1000
+              c: [0.0, 0.001]
+
+    Every list in 'params' is a grid dimension; the experiment is expanded into one job per seed and
+    per point of the parameter grid. Parameters that are not given are taken from the defaults file.
+    :param file_name: path to the manifest
+    :return: the manifest
+    """
+    with open(file_name) as f:
+        manifest = yaml.safe_load(f)
+    assert 'experiments' in manifest, 'The manifest does not list any experiments'
+    return manifest
+
+
+def expand(manifest: Dict[str, Any], defaults: Optional[Dict[str, Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """
+    expands the manifest into a list of jobs
+    :param manifest: the manifest, see load_manifest()
+    :param defaults: default parameters for each environment, e.g., the contents of defaults.yml
+    :return: a list of jobs; each job is a dictionary of arguments for run()
+    """
+    defaults = {} if defaults is None else defaults
+    jobs = []
+    for experiment in manifest['experiments']:
+        env_name = experiment['env']
+        params = {key: value for key, value in experiment.get('params', {}).items() if key not in IGNORED_KEYS}
+        grid_keys = [key for key in params if isinstance(params[key], list)]
+        grid = itertools.product(*[params[key] for key in grid_keys])
+        seeds = experiment.get('seeds', [None])
+        for point, seed in itertools.product(list(grid), seeds):
+            env_defaults = defaults.get(env_name, defaults.get(env_name.split('-')[0], {}))
+            job = {key: value for key, value in env_defaults.items() if key not in IGNORED_KEYS}
+            job.update({key: value for key, value in params.items() if key not in grid_keys})
+            job.update(zip(grid_keys, point))
+            if 'trials' in experiment:
+                job['trials'] = experiment['trials']
+            job['env'] = env_name
+            job['env_kwargs'] = experiment.get('kwargs')
+            job['methods'] = experiment.get('methods')
+            job['seed'] = seed
+            jobs.append(job)
+    return jobs
+
+
+def job_hash(job: Dict[str, Any]) -> str:
+    """
+    hashes the full configuration of a job; the smoothing is only part of it if it sets the size of the recorded blocks
+    :param job: the job
+    :return: hex digest of the job's configuration
+    """
+    ignored = IGNORED_KEYS
+    if job.get('record') in (None, 'full') or job.get('record_block') is not None:
+        ignored += AGGREGATE_KEYS
+    config = {key: value for key, value in job.items() if key not in ignored}
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def job_path(job: Dict[str, Any], save_dir: str) -> str:
+    """
+    path to the directory with the job's results
+    :param job: the job
+    :param save_dir: directory where the data is saved
+    :return: the path
+    """
+    return os.path.join(save_dir, job['env'], job_hash(job))
+
+
+def is_done(job: Dict[str, Any], save_dir: str) -> bool:
+    """
+    checks if the job's results are already in the results store
+    :param job: the job
+    :param save_dir: directory where the data is saved
+    """
+    return os.path.exists(os.path.join(job_path(job, save_dir), JOB_FILE))
+
+
+def run_manifest(manifest: Dict[str, Any],
+                 defaults: Optional[Dict[str, Dict[str, Any]]] = None,
+                 save_dir: Optional[str] = None,
+                 verbose: int = 0,
+                 dry_run: bool = False) -> List[Dict[str, Any]]:
+    """
+    runs all jobs of the manifest that do not have results yet
+    :param manifest: the manifest, see load_manifest()
+    :param defaults: default parameters for each environment
+    :param save_dir: directory where the data is saved; overrides the manifest's save_dir
+    :param verbose: verbosity
+    :param dry_run: if True, only report which jobs would be run
+    :return: a list of jobs that were (or would be) run
+    """
+    from run import run
+
+    save_dir = manifest.get('save_dir', 'results') if save_dir is None else save_dir
+    jobs = expand(manifest, defaults)
+    pending = [job for job in jobs if not is_done(job, save_dir)]
+    if verbose >= 1:
+        print(f'{len(jobs)} jobs in the manifest, {len(jobs) - len(pending)} already done.')
+    if dry_run:
+        return pending
+
+    for n, job in enumerate(pending):
+        path = job_path(job, save_dir)
+        if verbose >= 1:
+            print(f'Running job {n + 1}/{len(pending)}: {path}')
+
+        # remove the results of an interrupted attempt
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+
+        run(**job, save=True, save_dir=save_dir, run_name=job_hash(job), plot=False, verbose=max(verbose - 1, 0))
+
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, JOB_FILE), 'w') as f:
+            yaml.safe_dump(job, f)
+    return pending
+
+
+def parse_args():
+    """
+    parse the command line arguments
+    :return: (dict) the arguments
+    """
+    parser = argparse.ArgumentParser(description='Run all experiments from a manifest that do not have results yet')
+    parser.add_argument('manifest', help='Path to the manifest', type=str)
+    parser.add_argument('--defaults', help='Path to the defaults file', type=str, default=DEFAULT_DEFAULTS_FILE)
+    parser.add_argument('--save_dir', help='Directory to save the results', type=str)
+    parser.add_argument('--dry-run', help='Only list the jobs that would be run', dest='dry_run', action='store_true')
+    parser.add_argument('-v', '--verbose', help='increase output verbosity', action='count', default=0)
+    return vars(parser.parse_args())
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    with open(args['defaults']) as f:
+        defaults = yaml.safe_load(f)
+    manifest = load_manifest(args['manifest'])
+    save_dir = manifest.get('save_dir', 'results') if args['save_dir'] is None else args['save_dir']
+    jobs = run_manifest(manifest, defaults, save_dir, args['verbose'], args['dry_run'])
+    if args['dry_run']:
+        for job in jobs:
+            print(job_path(job, save_dir))
@@ -0,0 +1,205 @@
+import os
+import time
+import numpy as np
+from typing import Any, Dict, Optional
+
+DEFAULT_CALIBRATION = 2.0               # seconds of calibration of all agents together
+SOLVER_COPIES = 5                       # dense (nA, nS + 1, nS + 1) arrays alive at once while solving
+ROW_MEMORY = 500                        # bytes of memory per result row (a dictionary)
+ROW_DISK = 80                           # bytes on disk per result row in the csv-file
+REWARD_MEMORY = 32                      # bytes of memory per reward kept by an agent (a float in a list)
+COMPACT_DTYPES = {'q_dtype': 'float32', 'count_dtype': 'uint16'}
+
+
+def available_memory() -> int:
+    """
+    memory available to a new process in bytes
+    """
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_AVPHYS_PAGES')
+
+
+def table_memory(nH: int, nS: int, nA: int, q_dtype=None, count_dtype=None, stationary: bool = False) -> int:
+    """
+    memory footprint of the tables of one agent in bytes
+    :param nH: number of steps
+    :param nS: number of states
+    :param nA: number of actions
+    :param q_dtype: type of the Q-table
+    :param count_dtype: type of the visit counts
+    :param stationary: whether the agent keeps a single table for all steps
+    :return: the footprint
+    """
+    from agent.episodic_q_learning_agent import DEFAULT_Q_DTYPE, DEFAULT_COUNT_DTYPE
+
+    q_size = np.dtype(DEFAULT_Q_DTYPE if q_dtype is None else q_dtype).itemsize
+    count_size = np.dtype(DEFAULT_COUNT_DTYPE if count_dtype is None else count_dtype).itemsize
+    if stationary:
+        return nS * nA * (q_size + count_size)
+    return (nH + 1) * nS * nA * q_size + nH * nS * nA * count_size
+
+
+def result_rows(episodes: int, record: Optional[str] = None, record_window: Optional[int] = None,
+                record_block: Optional[int] = None, record_levels: Optional[int] = None,
+                smoothing: float = 0.05) -> int:
+    """
+    number of result rows per agent and trial
+    :return: the number of rows; see run() for the parameters
+    """
+    from process_results.aggregate import DEFAULT_WINDOW, DEFAULT_LEVELS
+
+    if record is None or record == 'full':
+        return episodes
+    window = min(DEFAULT_WINDOW if record_window is None else record_window, episodes)
+    block = max(int(smoothing * episodes) // 10, 1) if record_block is None else record_block
+    levels = DEFAULT_LEVELS if record_levels is None else record_levels
+    blocks = (episodes - window) / block if record == 'fixed' else np.log2(max((episodes - window) / block, 1)) + 1
+    return int(window + np.ceil(blocks) * sum(0.5 ** level for level in range(levels)))
+
+
+def plan(
+        env,
+        trials: int = 1,
+        episodes: int = 10000,
+        steps: Optional[int] = None,
+        discount: float = 1.0,
+        calibration: float = DEFAULT_CALIBRATION,
+        show: bool = True,
+        **kwargs
+) -> Dict[str, Any]:
+    """
+    Predicts the memory footprint and the wall time of run() with the same arguments without running it.
+    The environment is built and every agent is run for a short calibration to measure its speed.
+    :param env: Environment: either an OpenAI Gym environment or a string
+    :param trials: Number of trials to run
+    :param episodes: Number of episodes in each trial
+    :param steps: Number of time steps per episode
+    :param discount: Discounting factor
+    :param calibration: total time in seconds to run the agents for calibration
+    :param show: whether to print the plan
+    :param kwargs: other arguments of run()
+    :return: a dictionary with the predicted footprints in bytes, the predicted times in seconds,
+    the available memory, warnings, and the recommended arguments of run()
+    """
+    from run import make_env, make_agents
+    import process_results as pr
+
+    env, env_name, steps = make_env(env, steps, kwargs.get('env_kwargs'), bool(kwargs.get('intern_observations')),
+                                    kwargs.get('num_states'))
+    nS, nA = env.nS, env.nA         # the worst case for interned observations
+    agent_kwargs = {key: kwargs[key] for key in ('starting_q', 'exploration_rate', 'exploration_rate_decay',
+                                                 'min_exploration_rate', 'delta', 'c', 'lamb', 'omega', 'methods',
+                                                 'q_dtype', 'count_dtype', 'fused', 'stationary')
+                    if kwargs.get(key) is not None}
+    agents = make_agents(env, steps, discount, **agent_kwargs)
+
+    # memory of the agents, the solver, and the results
+    stationary = bool(kwargs.get('stationary'))
+    tables = table_memory(steps, nS, nA, kwargs.get('q_dtype'), kwargs.get('count_dtype'), stationary) * len(agents)
+    rewards = episodes * steps * REWARD_MEMORY * len(agents)
+    if hasattr(env.unwrapped, 'sparse_model'):
+        next_states = env.unwrapped.sparse_model()[0]
+        solver = SOLVER_COPIES * next_states.size * 8 + ((steps + 1) * (nS + 1) + steps * (nS + 1) * nA) * 8
+    else:
+        solver = SOLVER_COPIES * nA * (nS + 1) ** 2 * 8
+    rows = result_rows(episodes, kwargs.get('record'), kwargs.get('record_window'), kwargs.get('record_block'),
+                       kwargs.get('record_levels'), kwargs.get('smoothing') or 0.05) * trials * len(agents)
+    results_memory = rows * ROW_MEMORY
+    peak = max(solver, tables + rewards + results_memory)
+    available = available_memory()
+
+    # calibration: run every agent for a short while to measure its speed
+    seconds_per_episode = []
+    for a in agents:
+        a.reset_environment()
+        n, start = 0, time.perf_counter()
+        while time.perf_counter() - start < calibration / len(agents) and n < episodes:
+            a.run(1)
+            n += 1
+        seconds_per_episode.append((time.perf_counter() - start) / max(n, 1))
+        a.reset_environment()
+    learning_time = sum(seconds_per_episode) * episodes * trials
+
+    # the solver is only timed if it fits comfortably
+    solver_time = None
+    if solver < available / 10 and hasattr(env.unwrapped, 'P'):
+        start = time.perf_counter()
+        pr.solve(env.unwrapped, discount, steps)
+        solver_time = time.perf_counter() - start
+
+    warnings, recommended = [], {}
+    if tables + rewards > available:
+        compact = table_memory(steps, nS, nA, stationary=stationary, **COMPACT_DTYPES) * len(agents) + rewards
+        single = table_memory(steps, nS, nA, kwargs.get('q_dtype'), kwargs.get('count_dtype'), True) * len(agents)
+        if compact <= available:
+            recommended.update(COMPACT_DTYPES)
+            warnings.append('The agents\' tables do not fit into the memory; use compact types.')
+        elif not stationary and discount < 1 and single + rewards <= available:
+            recommended['stationary'] = True
+            warnings.append('The agents\' tables do not fit into the memory; use stationary tables.')
+        else:
+            warnings.append('The agents\' tables do not fit into the memory even with compact types.')
+    if tables + rewards + results_memory > available and kwargs.get('record') in (None, 'full'):
+        recommended['record'] = 'fixed'
+        warnings.append('The results do not fit into the memory; record block aggregates instead.')
+    if solver > available:
+        warnings.append('The dense solver does not fit into the memory.')
+
+    result = {
+        'env': env_name,
+        'states': nS,
+        'actions': nA,
+        'steps': steps,
+        'agents': [a.name for a in agents],
+        'table memory': tables,
+        'reward memory': rewards,
+        'solver memory': solver,
+        'results memory': results_memory,
+        'results disk': rows * ROW_DISK,
+        'peak memory': peak,
+        'available memory': available,
+        'seconds per episode': dict(zip([a.name for a in agents], seconds_per_episode)),
+        'solver time': solver_time,
+        'learning time': learning_time,
+        'wall time': learning_time + (solver_time or 0.0),
+        'warnings': warnings,
+        'recommended': recommended
+    }
+    if show:
+        _print_plan(result)
+    return result
+
+
+def _print_plan(result):
+    def size(b):
+        for unit in ('B', 'KB', 'MB', 'GB'):
+            if b < 1024:
+                return f'{b:.1f} {unit}'
+            b /= 1024
+        return f'{b:.1f} TB'
+
+    def duration(t):
+        if t is None:
+            return 'unknown'
+        return f'{int(t // 3600)}:{int(t % 3600 // 60):02d}:{int(t % 60):02d} ({t:.1f} s)'
+
+    print(f'Plan for {result["env"]}: {result["states"]} states, {result["actions"]} actions, '
+          f'{result["steps"]} steps, agents: {", ".join(result["agents"])}.')
+    for key in ('table memory', 'reward memory', 'solver memory', 'results memory', 'results disk', 'peak memory',
+                'available memory'):
+        print(f'  {key}: {size(result[key])}')
+    for name, seconds in result['seconds per episode'].items():
+        print(f'  {name}: {seconds * 1000:.3f} ms per episode')
+    for key in ('solver time', 'learning time', 'wall time'):
+        print(f'  {key}: {duration(result[key])}')
+    for warning in result['warnings']:
+        print(f'Warning: {warning}')
+    if result['recommended']:
+        print('Recommended: ' + ' '.join(f'--{key}' if value is True else f'--{key} {value}'
+                                         for key, value in result['recommended'].items()))
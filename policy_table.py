@@ -0,0 +1,96 @@
+import json
+import numpy as np
+from typing import Any, Dict, Optional
+
+MAGIC = b'UCBHPOL1'
+ALIGNMENT = 64                          # the arrays start at multiples of this many bytes
+MARGIN_DTYPE = np.dtype('<f4')
+
+
+def write_policy(file_name: str, actions: np.ndarray, margins: Optional[np.ndarray] = None,
+                 stationary: bool = False, metadata: Optional[Dict[str, Any]] = None):
+    """
+    writes a horizon-indexed greedy policy into a compact file: a json header followed by the actions in the smallest
+    unsigned integer type that holds them and, optionally, the Q-margins as float32
+    :param file_name: file to write the policy to
+    :param actions: actions of shape (steps, nS), or (1, nS) for a stationary policy
+    :param margins: differences between the best and the second best Q-values of shape (steps, nS)
+    :param stationary: whether the same actions are taken at every step
+    :param metadata: additional information stored in the header, e.g., the agent's name
+    """
+    n_actions = int(actions.max()) + 1 if actions.size > 0 else 1
+    action_dtype = np.dtype(np.min_scalar_type(max(n_actions - 1, 0))).newbyteorder('<')
+    steps, states = actions.shape
+    header = {
+        'steps': steps,
+        'states': states,
+        'stationary': stationary,
+        'action_dtype': action_dtype.str,
+        'margins': margins is not None,
+        'metadata': {} if metadata is None else metadata
+    }
+    header = json.dumps(header).encode()
+    offset = _align(len(MAGIC) + 8 + len(header))
+    with open(file_name, 'wb') as f:
+        f.write(MAGIC)
+        f.write(offset.to_bytes(8, 'little'))
+        f.write(header.ljust(offset - len(MAGIC) - 8))
+        data = np.ascontiguousarray(actions, dtype=action_dtype)
+        f.write(data.tobytes())
+        if margins is not None:
+            f.write(bytes(_align(data.nbytes) - data.nbytes))
+            f.write(np.ascontiguousarray(margins, dtype=MARGIN_DTYPE).tobytes())
+
+
+class PolicyTable:
+
+    def __init__(self, file_name: str):
+        """
+        Memory-maps a policy written by write_policy() or agent.EpisodicQLearningAgent.export_policy() and
+        answers batched queries of the actions. Requires numpy only.
+        :param file_name: file with the policy
+        """
+        with open(file_name, 'rb') as f:
+            assert f.read(len(MAGIC)) == MAGIC, f'{file_name} is not a policy file'
+            offset = int.from_bytes(f.read(8), 'little')
+            header = json.loads(f.read(offset - len(MAGIC) - 8).decode().rstrip())
+        self.steps = header['steps']
+        self.states = header['states']
+        self.stationary = header['stationary']
+        self.metadata = header['metadata']
+        action_dtype = np.dtype(header['action_dtype'])
+        self.actions = np.memmap(file_name, dtype=action_dtype, mode='r', offset=offset,
+                                 shape=(self.steps, self.states))
+        self.margins = None
+        if header['margins']:
+            self.margins = np.memmap(file_name, dtype=MARGIN_DTYPE, mode='r',
+                                     offset=offset + _align(self.actions.nbytes), shape=(self.steps, self.states))
+
+    def query(self, h, states) -> np.ndarray:
+        """
+        looks up the actions of many (time step, state) pairs at once
+        :param h: time steps; an integer or an array that broadcasts against the states
+        :param states: states
+        :return: the actions
+        """
+        return self._gather(self.actions, h, states)
+
+    def margin(self, h, states) -> np.ndarray:
+        """
+        looks up how much better the chosen actions are than the second best ones, in the learned Q-values
+        :param h: time steps; an integer or an array that broadcasts against the states
+        :param states: states
+        :return: the margins
+        """
+        assert self.margins is not None, 'The policy was exported without margins'
+        return self._gather(self.margins, h, states)
+
+    def _gather(self, table, h, states):
+        states = np.asarray(states)
+        if self.stationary:
+            return table[0, states]
+        return table[np.asarray(h), states]
+
+
+def _align(n: int) -> int:
+    return -(-n // ALIGNMENT) * ALIGNMENT
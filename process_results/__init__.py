@@ -1,6 +1,14 @@
-from .plot import plot
-from .solve import solve
+from .plot import plot, summarize
+from .solve import solve, solution, compile_model, compile_models, solve_batch, solve_sparse, evaluate_policy
 from .save import save
 from .fetch_stat import fetch_stat
+from .cache import ModelCache
+from .writer import ResultsWriter
+from .aggregate import aggregate
+from .history import HistoryRecorder, load_history
+from .metrics import Metrics, MetricsServer, MetricsFile
+from .stopping import ConvergenceRule
 
-__all__ = ['plot', 'solve', 'save', 'fetch_stat']
+__all__ = ['plot', 'summarize', 'solve', 'solution', 'compile_model', 'compile_models', 'solve_batch',
+           'solve_sparse', 'evaluate_policy', 'save', 'fetch_stat', 'ModelCache', 'ResultsWriter', 'aggregate',
+           'HistoryRecorder', 'load_history', 'Metrics', 'MetricsServer', 'MetricsFile', 'ConvergenceRule']
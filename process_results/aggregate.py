@@ -0,0 +1,85 @@
+import numpy as np
+from typing import Dict, List, Union
+
+DEFAULT_WINDOW = 100                    # number of episodes recorded individually
+DEFAULT_BLOCK = 10                      # number of episodes in a block of the finest level
+DEFAULT_LEVELS = 4                      # number of levels in the pyramid
+DEFAULT_GROWTH = 2.0                    # growth factor of the blocks for geometric spacing
+KEY_FIELDS = ('method', 'trial', 'episode')
+
+
+def aggregate(
+        data: List[Dict[str, Union[str, int, float]]],
+        window: int = DEFAULT_WINDOW,
+        block: int = DEFAULT_BLOCK,
+        levels: int = DEFAULT_LEVELS,
+        spacing: str = 'fixed',
+        growth: float = DEFAULT_GROWTH
+) -> List[Dict[str, Union[str, int, float]]]:
+    """
+    replaces per-episode records by a multi-resolution pyramid of block aggregates. The first episodes of each
+    trial are kept as they are; the rest are split into blocks, and every stat is replaced by its mean, minimum and
+    maximum over the block. Level 0 holds the finest blocks; each next level merges pairs of blocks of the previous.
+    :param data: a list of dictionaries with the experiment's data, one per episode
+    :param window: number of episodes at the start of each trial that are kept individually
+    :param block: number of episodes in the first block of level 0
+    :param levels: number of levels in the pyramid
+    :param spacing: 'fixed' for blocks of equal size or 'geometric' for blocks growing by a factor of growth
+    :param growth: growth factor of the blocks for geometric spacing
+    :return: a list of dictionaries with 'count' episodes starting from 'episode' at the given 'level'
+    """
+    assert spacing in ('fixed', 'geometric'), 'Spacing must be either fixed or geometric'
+    groups = {}
+    for item in data:
+        groups.setdefault((item['method'], item['trial']), []).append(item)
+
+    result = []
+    for (method, trial), items in groups.items():
+        items = sorted(items, key=lambda item: item['episode'])
+        stats = [key for key in items[0] if key not in KEY_FIELDS]
+        values = np.array([[item[key] for key in stats] for item in items], dtype=float)
+
+        # individual episodes at the start of the trial
+        n_window = min(window, len(items))
+        for i in range(n_window):
+            row = {'method': method, 'trial': trial, 'episode': items[i]['episode'], 'level': 0, 'count': 1}
+            for j, key in enumerate(stats):
+                row[key] = items[i][key]
+                row[f'{key} min'] = row[f'{key} max'] = values[i, j]
+            result.append(row)
+        if n_window == len(items):
+            continue
+
+        # blocks of the finest level
+        starts, size, start = [], float(block), n_window
+        while start < len(items):
+            starts.append(start)
+            start += max(int(round(size)), 1)
+            if spacing == 'geometric':
+                size *= growth
+        starts = np.array(starts)
+        counts = np.diff(np.append(starts, len(items)))
+        means = np.add.reduceat(values, starts) / counts[:, None]
+        mins = np.minimum.reduceat(values, starts)
+        maxs = np.maximum.reduceat(values, starts)
+
+        # coarser levels by merging pairs of blocks
+        for level in range(max(levels, 1)):
+            for i in range(len(starts)):
+                row = {'method': method, 'trial': trial, 'episode': items[starts[i]]['episode'], 'level': level,
+                       'count': int(counts[i])}
+                for j, key in enumerate(stats):
+                    row[key] = means[i, j]
+                    row[f'{key} min'] = mins[i, j]
+                    row[f'{key} max'] = maxs[i, j]
+                result.append(row)
+            if len(starts) == 1:
+                break
+            pairs = np.arange(0, len(starts), 2)
+            sums = np.add.reduceat(means * counts[:, None], pairs)
+            mins = np.minimum.reduceat(mins, pairs)
+            maxs = np.maximum.reduceat(maxs, pairs)
+            counts = np.add.reduceat(counts, pairs)
+            means = sums / counts[:, None]
+            starts = starts[pairs]
+    return result
@@ -0,0 +1,110 @@
+import os
+import hashlib
+import numpy as np
+from typing import Dict, Optional
+
+DEFAULT_CACHE_DIR = 'cache'
+DEFAULT_MAX_SIZE = 1 << 30              # one gigabyte
+
+
+class ModelCache:
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_size: int = DEFAULT_MAX_SIZE):
+        """
+        Persistent content-addressed cache for compiled environment models and their solutions.
+        Entries are stored as .npz-files; the least recently used entries are evicted when the total size
+        exceeds the maximum size
+        :param directory: directory for the cache files
+        :param max_size: maximum total size of the cache in bytes
+        """
+        self._directory = directory
+        self._max_size = max_size
+
+    @staticmethod
+    def key(env, discount=1.0, steps=np.PINF) -> str:
+        """
+        computes a key of the environment's transition data together with the discount and the horizon
+        :param env: the environment; must have P, isd, nS, and nA
+        :param discount: discounting factor
+        :param steps: number of steps
+        :return: hex digest of the key
+        """
+        digest = hashlib.sha256()
+        digest.update(f'{env.nS}:{env.nA}:{float(discount)!r}:{float(steps)!r}:'.encode())
+        digest.update(repr(env.P).encode())
+        digest.update(np.ascontiguousarray(env.isd, dtype=float).tobytes())
+        return digest.hexdigest()
+
+    def load(self, key: str) -> Optional[Dict[str, np.ndarray]]:
+        """
+        loads an entry from the cache and marks it as recently used
+        :param key: entry's key
+        :return: a dictionary of arrays or None if there is no such entry
+        """
+        file_name = self._file_name(key)
+        try:
+            with np.load(file_name) as data:
+                entry = {name: data[name] for name in data.files}
+        except (OSError, ValueError):
+            return None
+        os.utime(file_name)
+        return entry
+
+    def store(self, key: str, entry: Dict[str, np.ndarray]):
+        """
+        stores an entry in the cache and evicts the least recently used entries if the cache is full
+        :param key: entry's key
+        :param entry: a dictionary of arrays
+        """
+        os.makedirs(self._directory, exist_ok=True)
+        file_name = self._file_name(key)
+        tmp_name = f'{file_name}.{os.getpid()}.tmp'
+        with open(tmp_name, 'wb') as f:
+            np.savez(f, **entry)
+        os.replace(tmp_name, file_name)
+        self._evict()
+
+    def invalidate(self, key: Optional[str] = None):
+        """
+        removes an entry from the cache
+        :param key: entry's key; if None, the whole cache is cleared
+        """
+        if key is not None:
+            file_names = [self._file_name(key)]
+        else:
+            file_names = [file_name for file_name, _, _ in self._entries()]
+        for file_name in file_names:
+            try:
+                os.remove(file_name)
+            except FileNotFoundError:
+                pass
+
+    def _file_name(self, key):
+        return os.path.join(self._directory, f'{key}.npz')
+
+    def _entries(self):
+        if not os.path.isdir(self._directory):
+            return []
+        entries = []
+        for name in os.listdir(self._directory):
+            if not name.endswith('.npz'):
+                continue
+            file_name = os.path.join(self._directory, name)
+            try:
+                stat = os.stat(file_name)
+            except FileNotFoundError:
+                continue
+            entries.append((file_name, stat.st_mtime, stat.st_size))
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+        for file_name, _, size in entries[:-1]:
+            if total <= self._max_size:
+                break
+            try:
+                os.remove(file_name)
+            except FileNotFoundError:
+                pass
+            total -= size
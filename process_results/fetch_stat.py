@@ -7,23 +7,31 @@ def fetch_stat(
         stat: str,
         episodes: int,
         trials: int,
+        level: int = 0
 ) -> Dict[str, np.ndarray]:
     """
-    reshapes the data for each agent into a numpy array and fills it with a single stat for plotting
+    reshapes the data for each agent into a numpy array and fills it with a single stat for plotting.
+    Block aggregates (see aggregate()) are spread over the episodes of their block.
     :param data: a list of dictionaries with the experiment's data
     :param stat: a stat to use in filling the arrays; all other stats will be discarded
     :param episodes: number of episodes
     :param trials: number of trials
+    :param level: level of the block aggregates to use
     :return: a dictionary of numpy arrays with a given stat for each agent
     """
     result = {}
-    for item in data:
-        method = item['method']
-        if method not in result:
-            result[method] = np.full((trials, episodes), np.inf)
-        episode = item.get('episode')
-        trial = item.get('trial')
-        if episode is not None and trial is not None:
-            result[method][trial, episode] = item.get(stat)
+    levels = (0,) if level == 0 else (0, level)
+    for current_level in levels:
+        for item in data:
+            method = item['method']
+            if method not in result:
+                result[method] = np.full((trials, episodes), np.inf)
+            if item.get('level', 0) != current_level:
+                continue
+            episode = item.get('episode')
+            trial = item.get('trial')
+            if episode is not None and trial is not None:
+                count = item.get('count', 1)
+                result[method][trial, episode:episode + count] = item.get(stat)
 
     return result
@@ -0,0 +1,85 @@
+import os
+import numpy as np
+from typing import Dict
+
+DEFAULT_EVERY = 100                     # number of episodes between snapshots
+DEFAULT_DTYPE = np.float32              # storage type of the Q-values
+Q_FILE = 'q.npy'
+VISITS_FILE = 'n_visits.npy'
+EPISODES_FILE = 'episodes.npy'
+
+
+class HistoryRecorder:
+
+    def __init__(self, path: str, snapshots: int, every: int = DEFAULT_EVERY, dtype=DEFAULT_DTYPE,
+                 min_delta: float = 0.0):
+        """
+        Records snapshots of the Q-table and the visit counts into preallocated memory-mapped .npy-files.
+        The files are allocated at the first snapshot.
+        :param path: directory for the files
+        :param snapshots: maximum number of snapshots
+        :param every: number of episodes between snapshots
+        :param dtype: storage type of the Q-values, e.g., numpy.float16 or numpy.float32
+        :param min_delta: a snapshot is skipped if no Q-value changed by more than this since the last snapshot
+        """
+        self._path = path
+        self._snapshots = max(snapshots, 1)
+        self._every = max(every, 1)
+        self._dtype = dtype
+        self._min_delta = min_delta
+        self._q, self._n_visits, self._episodes = None, None, None
+        self._count = 0
+
+    def record(self, episode: int, q: np.ndarray, n_visits: np.ndarray):
+        """
+        records a snapshot at the end of an episode if it is due
+        :param episode: episode number
+        :param q: the Q-table
+        :param n_visits: the visit counts
+        """
+        if (episode + 1) % self._every != 0 or self._count == self._snapshots:
+            return
+        if self._q is None:
+            self._allocate(q, n_visits)
+        elif self._min_delta > 0:
+            delta = np.max(np.abs(q - self._q[self._count - 1]))
+            if delta < self._min_delta:
+                return
+        self._q[self._count] = q
+        self._n_visits[self._count] = n_visits
+        self._episodes[self._count] = episode
+        self._count += 1
+
+    def close(self):
+        """
+        flushes the files to the disk
+        """
+        if self._q is not None:
+            for array in (self._q, self._n_visits, self._episodes):
+                array.flush()
+
+    def _allocate(self, q, n_visits):
+        os.makedirs(self._path, exist_ok=True)
+        self._q = np.lib.format.open_memmap(os.path.join(self._path, Q_FILE), mode='w+', dtype=self._dtype,
+                                            shape=(self._snapshots,) + q.shape)
+        self._n_visits = np.lib.format.open_memmap(os.path.join(self._path, VISITS_FILE), mode='w+',
+                                                   dtype=n_visits.dtype, shape=(self._snapshots,) + n_visits.shape)
+        self._episodes = np.lib.format.open_memmap(os.path.join(self._path, EPISODES_FILE), mode='w+',
+                                                   dtype=np.int64, shape=(self._snapshots,))
+        self._episodes[:] = -1
+
+
+def load_history(path: str) -> Dict[str, np.ndarray]:
+    """
+    opens a recorded history without loading it into the memory
+    :param path: directory with the recorded files
+    :return: a dictionary with read-only memory-mapped arrays: 'episodes' with the episode numbers of the snapshots,
+    and 'q' and 'n_visits' with the snapshots themselves
+    """
+    episodes = np.load(os.path.join(path, EPISODES_FILE), mmap_mode='r')
+    count = int(np.count_nonzero(episodes >= 0))
+    return {
+        'episodes': episodes[:count],
+        'q': np.load(os.path.join(path, Q_FILE), mmap_mode='r')[:count],
+        'n_visits': np.load(os.path.join(path, VISITS_FILE), mmap_mode='r')[:count]
+    }
@@ -0,0 +1,179 @@
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_INTERVAL = 5.0                  # seconds between rewrites of the metrics file
+DEFAULT_RATE_WINDOW = 60.0              # seconds over which the current speed is measured
+PREFIX = 'ucbh'
+
+
+class Metrics:
+
+    def __init__(self, planned_episodes: int, writer=None):
+        """
+        Operational counters of a run, rendered in the Prometheus text format
+        :param planned_episodes: total number of episodes of all agents in all trials
+        :param writer: ResultsWriter whose queue depth is reported
+        """
+        self._planned = planned_episodes
+        self._writer = writer
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        self._steps = 0
+        self._episodes = {}
+        self._skipped = 0
+        self._trial = 0
+        self._samples = deque([(self._start, 0)])
+
+    def start_trial(self, trial: int):
+        """
+        marks the start of a new trial
+        :param trial: trial number
+        """
+        with self._lock:
+            self._trial = trial
+
+    def episode_done(self, agent_name: str, steps: int):
+        """
+        counts a finished episode
+        :param agent_name: name of the agent
+        :param steps: number of steps in the episode
+        """
+        now = time.monotonic()
+        with self._lock:
+            key = (agent_name, self._trial)
+            self._episodes[key] = self._episodes.get(key, 0) + 1
+            self._steps += steps
+            if now - self._samples[-1][0] >= 1.0:
+                self._samples.append((now, self._steps))
+                while len(self._samples) > 2 and now - self._samples[0][0] > DEFAULT_RATE_WINDOW:
+                    self._samples.popleft()
+
+    def episodes_skipped(self, agent_name: str, num_episodes: int):
+        """
+        counts the remaining episodes of an agent that are not run since it has converged
+        :param agent_name: name of the agent
+        :param num_episodes: number of skipped episodes
+        """
+        with self._lock:
+            self._skipped += num_episodes
+
+    def render(self) -> str:
+        """
+        renders the metrics in the Prometheus text format
+        """
+        now = time.monotonic()
+        with self._lock:
+            steps = self._steps
+            episodes = dict(self._episodes)
+            skipped = self._skipped
+            since, steps_since = self._samples[0]
+        completed = sum(episodes.values())
+        elapsed = now - self._start
+        steps_per_second = (steps - steps_since) / (now - since) if now > since else 0.0
+        episodes_per_second = completed / elapsed if elapsed > 0 else 0.0
+        eta = (self._planned - completed - skipped) / episodes_per_second if episodes_per_second > 0 else float('nan')
+
+        lines = []
+
+        def metric(name, kind, description, values):
+            lines.append(f'# HELP {PREFIX}_{name} {description}')
+            lines.append(f'# TYPE {PREFIX}_{name} {kind}')
+            for labels, value in values:
+                lines.append(f'{PREFIX}_{name}{labels} {value}')
+
+        metric('steps_total', 'counter', 'Environment steps taken by all agents', [('', steps)])
+        metric('steps_per_second', 'gauge', 'Environment steps per second over the last minute',
+               [('', steps_per_second)])
+        metric('episodes_total', 'counter', 'Episodes completed per agent and trial',
+               [(f'{{agent="{a}",trial="{t}"}}', n) for (a, t), n in sorted(episodes.items())])
+        metric('episodes_completed', 'gauge', 'Episodes completed by all agents', [('', completed)])
+        metric('episodes_planned', 'gauge', 'Episodes planned for all agents', [('', self._planned)])
+        metric('episodes_skipped', 'gauge', 'Episodes not run since the agents had converged', [('', skipped)])
+        metric('elapsed_seconds', 'gauge', 'Time since the start of the run', [('', elapsed)])
+        metric('eta_seconds', 'gauge', 'Estimated time until the end of the run', [('', eta)])
+        metric('rss_bytes', 'gauge', 'Resident memory of the process', [('', _rss())])
+        if self._writer is not None:
+            metric('writer_queue_depth', 'gauge', 'Result blocks waiting to be written',
+                   [('', self._writer.qsize())])
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsServer:
+
+    def __init__(self, metrics: Metrics, port: int, host: str = '127.0.0.1'):
+        """
+        Serves the metrics over HTTP from a background thread
+        :param metrics: the metrics
+        :param port: port to listen on
+        :param host: address to listen on
+        """
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name='MetricsServer', daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """
+        stops the server
+        """
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class MetricsFile:
+
+    def __init__(self, metrics: Metrics, file_name: str, interval: float = DEFAULT_INTERVAL):
+        """
+        Periodically rewrites a file with the metrics from a background thread,
+        e.g., for the textfile collector of the Prometheus node exporter
+        :param metrics: the metrics
+        :param file_name: file to write the metrics to
+        :param interval: time in seconds between rewrites
+        """
+        self._metrics = metrics
+        self._file_name = file_name
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._work, name='MetricsFile', daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """
+        writes the metrics one last time and stops the thread
+        """
+        self._stop.set()
+        self._thread.join()
+
+    def _work(self):
+        while True:
+            stop = self._stop.wait(self._interval)
+            tmp_name = f'{self._file_name}.{os.getpid()}.tmp'
+            with open(tmp_name, 'w') as f:
+                f.write(self._metrics.render())
+            os.replace(tmp_name, self._file_name)
+            if stop:
+                break
+
+
+def _rss():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
@@ -28,38 +28,57 @@ def _moving_average(a, n=DEFAULT_MOVING_AVERAGE_ORDER):
     return ret[n - 1:] / n
 
 
-def _plot_data(x, y, q=None, color=None, alpha_fill=0.2, label=None, ma=DEFAULT_MOVING_AVERAGE_ORDER, ax=None):
+def summarize(y: np.ndarray, q: Optional[float] = None,
+              ma: int = DEFAULT_MOVING_AVERAGE_ORDER) -> Dict[str, np.ndarray]:
+    """
+    computes the smoothed curves that plot() draws for a single agent
+    :param y: the agent's data of shape (trials, episodes), see fetch_stat()
+    :param q: quantile of the lower curve of the inter-quantile range; no quantiles if None
+    :param ma: moving average, must be at least 1
+    :return: a dictionary with the smoothed 'avg' and, for several trials, 'sem' and the 'upper' and 'lower' quantiles
+    """
+    summary = {'avg': _moving_average(np.average(y, axis=0), ma)}
+    if len(y) > 1:
+        summary['sem'] = _moving_average(st.sem(y, axis=0), ma)
+        if q is not None:
+            q = min(q, 1-q)
+            summary['upper'] = _moving_average(np.quantile(y, 1 - q, axis=0), ma)
+            summary['lower'] = _moving_average(np.quantile(y, q, axis=0), ma)
+    return summary
+
+
+def _plot_data(x, y, q=None, color=None, alpha_fill=0.2, label=None, ma=DEFAULT_MOVING_AVERAGE_ORDER, ax=None,
+               summary=None):
 
     ax = ax if ax is not None else plt.gca()
     if color is None:
         color = ax._get_lines.color_cycle.next()
 
-    avg = _moving_average(np.average(y, axis=0), ma)
+    summary = summarize(y, q, ma) if summary is None else summary
+    avg = summary['avg']
     line = ax.plot(x, avg, color=color, label=label)[0]
-    if len(y) > 1:
-        sem = _moving_average(st.sem(y, axis=0), ma)
-        y_min = avg - sem
-        y_max = avg + sem
+    if 'sem' in summary:
+        y_min = avg - summary['sem']
+        y_max = avg + summary['sem']
         ax.fill_between(x, y_max, y_min, color=color, alpha=alpha_fill)
-        if q is not None:
-            q = min(q, 1-q)
-            upper_quantile = _moving_average(np.quantile(y, 1 - q, axis=0), ma)
-            lower_quantile = _moving_average(np.quantile(y, q, axis=0), ma)
-            ax.fill_between(x, upper_quantile, lower_quantile, color=color, alpha=alpha_fill)
+        if 'upper' in summary:
+            ax.fill_between(x, summary['upper'], summary['lower'], color=color, alpha=alpha_fill)
     return line
 
 
-def plot(data: Dict[str, np.ndarray],
+def plot(data: Optional[Dict[str, np.ndarray]],
          title: str,
          colors: List[str] = None,
          ma: int = DEFAULT_MOVING_AVERAGE_ORDER,
          show_q: bool = DEFAULT_PLOT_QUANTILES,
          iqr: float = DEFAULT_INTERQUANTILE_RANGE,
          episodes: Optional[int] = None,
-         solution: float = None):
+         solution: float = None,
+         file_name: Union[str, List[str], None] = None,
+         summaries: Optional[Dict[str, Dict[str, np.ndarray]]] = None):
     """
     Plots the data after it has been reshapen with fetch_stat
-    :param data: the data
+    :param data: the data; may be None if the summaries are given
     :param title: Plot's title
     :param colors: a list of colors for plotting
     :param ma: moving average, must be at least 1
@@ -67,15 +86,17 @@ def plot(data: Dict[str, np.ndarray],
     :param iqr: which inter-quantile range to show
     :param episodes: number of episodes
     :param solution: the solution; plotted in dashed line
+    :param file_name: file or list of files to save the figure to instead of showing it, e.g., 'results.png'
+    :param summaries: precomputed curves of each agent, see summarize(); the data is not used then
     """
     if colors is None:
         colors = DEFAULT_COLORS
     agent_colors = {}
-    agents = list(data.keys())
+    agents = list(data.keys() if summaries is None else summaries.keys())
+    ma = max(ma, 1)
     if episodes is None:
-        episodes = data[agents[0]].shape[0]
+        episodes = data[agents[0]].shape[1] if summaries is None else len(summaries[agents[0]]['avg']) + ma - 1
     results = data
-    ma = max(ma, 1)
 
     for agent_n in range(len(agents)):
         agent_name = agents[agent_n]
@@ -89,9 +110,16 @@ def plot(data: Dict[str, np.ndarray],
     lines = []
     for agent_name in agents:
         q = (1.0 - iqr) / 2 if show_q else None
-        l = _plot_data(x, results[agent_name], q, agent_colors[agent_name], label=agent_name, ma=ma)
+        summary = None if summaries is None else summaries[agent_name]
+        y = None if results is None else results.get(agent_name)
+        l = _plot_data(x, y, q, agent_colors[agent_name], label=agent_name, ma=ma, summary=summary)
         lines.append(l)
     plt.legend(loc=4)
     if title is not None:
         plt.title(title)
-    plt.show()
+    if file_name is None:
+        plt.show()
+    else:
+        for name in [file_name] if isinstance(file_name, str) else file_name:
+            plt.savefig(name)
+        plt.close()
@@ -1,15 +1,22 @@
 import numpy as np
 import mdptoolbox as mdp
+from typing import Dict, List, Tuple, Union
 
+DEFAULT_EPSILON = 0.00001               # stopping tolerance of value iteration
+DEFAULT_MAX_ITER = 100000               # maximum number of iterations of value iteration
 
-def solve(env, discount=1.0, steps=np.PINF):
+
+def compile_model(env):
     """
-    solves the problem as an MDP. requires mdptoolbox.
+    builds dense transition and reward tensors of the environment. An extra absorbing state is added
+    at the end for the terminal transitions. Environments that keep their model in arrays, such as
+    environment.GarnetEnv, build the tensors themselves with a dense_model() method.
     :param env: the environment
-    :param discount: discounting factor
-    :param steps: number of steps
-    :return: the solution, i.e., the (discounted) value of the problem
+    :return: (transitions, rewards), both of shape (nA, nS + 1, nS + 1)
     """
+    unwrapped = getattr(env, 'unwrapped', env)
+    if hasattr(unwrapped, 'dense_model'):
+        return unwrapped.dense_model()
     nS = env.nS + 1
     nA = env.nA
     t = np.zeros((nA, nS, nS))
@@ -26,14 +33,218 @@ def solve(env, discount=1.0, steps=np.PINF):
                     r[a, s, s_p] = rew
             t[a, s, :] /= np.sum(t[a, s, :])
         t[a, nS - 1, nS - 1] = 1.0
+    return t, r
+
+
+def compile_models(envs: List) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    builds the dense tensors for a family of environments with identical state and action spaces
+    :param envs: the environments
+    :return: (transitions, rewards, isd) of shapes (batch, nA, nS + 1, nS + 1), (batch, nA, nS + 1, nS + 1),
+    and (batch, nS + 1)
+    """
+    assert len({(env.nS, env.nA) for env in envs}) == 1, 'All environments must have the same states and actions'
+    models = [compile_model(env) for env in envs]
+    t = np.stack([m[0] for m in models])
+    r = np.stack([m[1] for m in models])
+    isd = np.stack([np.append(np.asarray(env.isd, dtype=float), 0.0) for env in envs])
+    return t, r, isd
+
+
+def solve_batch(transitions: np.ndarray, rewards: np.ndarray, isd: np.ndarray,
+                discount: Union[float, np.ndarray] = 1.0, steps=np.PINF,
+                epsilon: float = DEFAULT_EPSILON, max_iter: int = DEFAULT_MAX_ITER) -> Dict[str, np.ndarray]:
+    """
+    solves a batch of MDPs with identical state and action spaces at once. Uses backward induction for
+    a finite horizon and value iteration for an infinite one.
+    :param transitions: transition probabilities of shape (batch, nA, nS, nS), e.g., from compile_models()
+    :param rewards: rewards of shape (batch, nA, nS, nS)
+    :param isd: initial state distributions of shape (batch, nS)
+    :param discount: discounting factor, either common or one per MDP; must be below 1 for an infinite horizon
+    :param steps: number of steps
+    :param epsilon: stopping tolerance of value iteration
+    :param max_iter: maximum number of iterations of value iteration
+    :return: a dictionary with the optimal values 'v' of shape (batch, steps + 1, nS) or (batch, nS), the optimal
+    Q-values 'q' of shape (batch, steps, nS, nA) or (batch, nS, nA), the optimal 'policy' of shape (batch, steps, nS)
+    or (batch, nS), and the 'value' of each problem
+    """
+    batch, nA, nS, _ = transitions.shape
+    gamma = np.broadcast_to(np.asarray(discount, dtype=float), (batch,))[:, None, None]
+    expected_r = np.sum(transitions * rewards, axis=3)
+
+    def bellman(v):
+        return expected_r + gamma * np.matmul(transitions, v[:, None, :, None])[..., 0]
+
+    if steps == np.PINF:
+        assert np.all(gamma < 1), 'Discount must be below 1 for an infinite horizon'
+        threshold = epsilon * (1 - gamma.max()) / (2 * gamma.max()) if gamma.max() > 0 else epsilon
+        v = np.zeros((batch, nS))
+        q = bellman(v)
+        for _ in range(max_iter):
+            v_new = q.max(axis=1)
+            q = bellman(v_new)
+            converged = np.max(np.abs(v_new - v)) < threshold
+            v = v_new
+            if converged:
+                break
+        q = np.swapaxes(q, 1, 2)
+        v = q.max(axis=2)
+        policy = q.argmax(axis=2)
+        v_0 = v
+    else:
+        steps = int(steps)
+        v = np.zeros((batch, steps + 1, nS))
+        q = np.zeros((batch, steps, nS, nA))
+        for n in range(steps - 1, -1, -1):
+            q[:, n] = np.swapaxes(bellman(v[:, n + 1]), 1, 2)
+            v[:, n] = q[:, n].max(axis=2)
+        policy = q.argmax(axis=3)
+        v_0 = v[:, 0]
+
+    return {
+        'v': v,
+        'q': q,
+        'policy': policy,
+        'value': np.sum(v_0 * isd, axis=1)
+    }
+
+
+def solve_sparse(next_states: np.ndarray, probabilities: np.ndarray, rewards: np.ndarray, discount: float = 1.0,
+                 steps=np.PINF, epsilon: float = DEFAULT_EPSILON,
+                 max_iter: int = DEFAULT_MAX_ITER) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    solves an MDP without terminal states in which every state-action pair leads to a few next states, e.g.,
+    environment.GarnetEnv. The values of the next states are gathered instead of multiplying dense tensors, so the
+    memory is linear in the number of states.
+    :param next_states: possible next states of shape (nS, nA, branching)
+    :param probabilities: their probabilities of shape (nS, nA, branching)
+    :param rewards: rewards of shape (nS, nA)
+    :param discount: discounting factor; must be below 1 for an infinite horizon
+    :param steps: number of steps
+    :param epsilon: stopping tolerance of value iteration
+    :param max_iter: maximum number of iterations of value iteration
+    :return: (v, q), the optimal values of shape (steps + 1, nS) or (nS,) and the optimal Q-values of shape
+    (steps, nS, nA) or (nS, nA)
+    """
+    def bellman(v):
+        return rewards + discount * np.sum(probabilities * v[next_states], axis=2)
+
+    if steps == np.PINF:
+        assert discount < 1, 'Discount must be below 1 for an infinite horizon'
+        threshold = epsilon * (1 - discount) / (2 * discount) if discount > 0 else epsilon
+        v = np.zeros(len(rewards))
+        q = bellman(v)
+        for _ in range(max_iter):
+            v_new = q.max(axis=1)
+            q = bellman(v_new)
+            converged = np.max(np.abs(v_new - v)) < threshold
+            v = v_new
+            if converged:
+                break
+        return q.max(axis=1), q
+
+    steps = int(steps)
+    v = np.zeros((steps + 1, len(rewards)))
+    q = np.zeros((steps,) + rewards.shape)
+    for n in range(steps - 1, -1, -1):
+        q[n] = bellman(v[n + 1])
+        v[n] = q[n].max(axis=1)
+    return v, q
+
+
+def evaluate_policy(transitions: np.ndarray, rewards: np.ndarray, isd: np.ndarray, policy: np.ndarray,
+                    discount: float = 1.0) -> float:
+    """
+    computes the exact value of a horizon-indexed deterministic policy by backward induction
+    :param transitions: transition probabilities of shape (nA, nS, nS), e.g., from compile_model()
+    :param rewards: rewards of shape (nA, nS, nS)
+    :param isd: initial state distribution of shape (nS,)
+    :param policy: actions of shape (steps, nS); states that are missing at the end, such as the absorbing
+    terminal state of compile_model(), take action 0
+    :param discount: discounting factor
+    :return: the (discounted) value of the policy
+    """
+    nA, nS, _ = transitions.shape
+    steps = policy.shape[0]
+    actions = np.zeros((steps, nS), dtype=int)
+    actions[:, :policy.shape[1]] = policy
+    states = np.arange(nS)
+    expected_r = np.sum(transitions * rewards, axis=2)
+    v = np.zeros(nS)
+    for n in range(steps - 1, -1, -1):
+        a = actions[n]
+        v = expected_r[a, states] + discount * transitions[a, states].dot(v)
+    return float(np.dot(v, isd))
+
+
+def solution(env, discount=1.0, steps=np.PINF, cache=None) -> Dict[str, np.ndarray]:
+    """
+    solves the problem as an MDP and returns the model together with the solver output. requires mdptoolbox.
+    Environments with a sparse_model() method, such as environment.GarnetEnv, are solved by solve_sparse() instead;
+    their dense 'transitions' and 'rewards' are then left out.
+    :param env: the environment
+    :param discount: discounting factor
+    :param steps: number of steps
+    :param cache: ModelCache to look the solution up in and to store it to
+    :return: a dictionary with the compiled model ('transitions', 'rewards', 'isd'), the optimal values 'v'
+    of shape (steps + 1, nS + 1) or (nS + 1,), the optimal Q-values 'q' of shape (steps, nS + 1, nA) or (nS + 1, nA),
+    and the 'value' of the problem
+    """
+    key = None
+    if cache is not None:
+        key = cache.key(env, discount, steps)
+        entry = cache.load(key)
+        if entry is not None:
+            return entry
+
+    isd = np.append(np.asarray(env.isd, dtype=float), 0.0)
+    unwrapped = getattr(env, 'unwrapped', env)
+    if hasattr(unwrapped, 'sparse_model'):
+        v, q = solve_sparse(*unwrapped.sparse_model(), discount, steps)
+        # the absorbing terminal state is never reached
+        v = np.concatenate((v, np.zeros(v.shape[:-1] + (1,))), axis=-1)
+        q = np.concatenate((q, np.zeros(q.shape[:-2] + (1, q.shape[-1]))), axis=-2)
+        entry = {}
+    else:
+        t, r = compile_model(env)
+        v, q = _solve(t, r, discount, steps)
+        entry = {'transitions': t, 'rewards': r}
+    v_0 = v if steps == np.PINF else v[0]
+    entry.update({
+        'isd': isd,
+        'v': v,
+        'q': q,
+        'value': np.array(np.dot(v_0, isd))
+    })
+
+    if cache is not None:
+        cache.store(key, entry)
+    return entry
+
+
+def solve(env, discount=1.0, steps=np.PINF, cache=None):
+    """
+    solves the problem as an MDP. requires mdptoolbox.
+    :param env: the environment
+    :param discount: discounting factor
+    :param steps: number of steps
+    :param cache: ModelCache to look the solution up in and to store it to
+    :return: the solution, i.e., the (discounted) value of the problem
+    """
+    return float(solution(env, discount, steps, cache)['value'])
+
+
+def _solve(t, r, discount, steps):
+    expected_r = np.sum(t * r, axis=2)
     if steps == np.PINF:
         m = mdp.mdp.PolicyIterationModified(transitions=t,
                                             reward=r, discount=discount, epsilon=0.00001, max_iter=1000)
         m.run()
-        v = m.V
+        v = np.asarray(m.V)
+        q = (expected_r + discount * t.dot(v)).T
     else:
         m = mdp.mdp.FiniteHorizon(transitions=t, reward=r, discount=discount, N=steps)
         m.run()
-        v = m.V[:, 0]
-    result = np.sum([v[i] * env.isd[i] for i in range(nS - 1)])
-    return result
+        v = np.asarray(m.V).T
+        q = np.stack([(expected_r + discount * t.dot(v[n + 1])).T for n in range(int(steps))])
+    return v, q
@@ -0,0 +1,73 @@
+import numpy as np
+from typing import Dict
+from .solve import evaluate_policy
+
+DEFAULT_EPSILON = 0.001                 # allowed gap between the policy's value and the optimum
+DEFAULT_WINDOW = 1000                   # number of episodes the policy must stay near-optimal
+DEFAULT_EVERY = 100                     # number of episodes between checks
+
+
+class ConvergenceRule:
+
+    def __init__(self, model: Dict[str, np.ndarray], optimum: float, discount: float = 1.0,
+                 epsilon: float = DEFAULT_EPSILON, window: int = DEFAULT_WINDOW, every: int = DEFAULT_EVERY):
+        """
+        Stopping rule for a single agent: evaluates the agent's greedy policy every few episodes and reports
+        convergence once its value has stayed within epsilon of the optimum for a window of episodes. The actions
+        themselves are not compared, since ties and unreachable states keep changing them after the value is optimal
+        :param model: compiled model with 'transitions', 'rewards', and 'isd', e.g., from solution()
+        :param optimum: the optimal value of the problem
+        :param discount: discounting factor
+        :param epsilon: allowed gap between the policy's value and the optimum
+        :param window: number of episodes the policy must stay near-optimal
+        :param every: number of episodes between checks
+        """
+        self._t, self._r, self._isd = model['transitions'], model['rewards'], model['isd']
+        self._optimum = optimum
+        self._discount = discount
+        self._epsilon = epsilon
+        self._window = window
+        self._every = max(every, 1)
+        self.reset()
+
+    def reset(self):
+        """
+        prepares the rule for a new trial
+        """
+        self._episodes = 0
+        self._stable = 0
+        self._policy = None
+        self._value = None
+
+    def check(self, agent) -> bool:
+        """
+        checks the agent at the end of an episode
+        :param agent: an agent with a greedy_policy() method returning an array of actions of shape (steps, nS)
+        :return: True if the agent has converged
+        """
+        self._episodes += 1
+        if self._episodes % self._every != 0:
+            return False
+        policy = agent.greedy_policy()
+        value = evaluate_policy(self._t, self._r, self._isd, policy, self._discount)
+        # only the value counts: ties and unreachable states keep flipping the greedy actions of an optimal policy,
+        # so requiring the same actions would never stop
+        if abs(self._optimum - value) <= self._epsilon:
+            self._stable += self._every
+        else:
+            self._stable = 0
+        self._policy, self._value = policy, value
+        return self._stable >= self._window
+
+    def stats(self) -> Dict[str, float]:
+        """
+        expected stats of an episode under the last checked policy
+        :return: a dictionary with the expected 'total reward', 'discounted total reward', and 'episode length'
+        """
+        length = np.ones_like(self._r)
+        length[:, -1, :] = 0.0          # the absorbing terminal state does not count
+        return {
+            'total reward': evaluate_policy(self._t, self._r, self._isd, self._policy, 1.0),
+            'discounted total reward': self._value,
+            'episode length': evaluate_policy(self._t, length, self._isd, self._policy, 1.0)
+        }
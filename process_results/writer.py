@@ -0,0 +1,161 @@
+import atexit
+import csv
+import io
+import os
+import queue
+import threading
+import time
+import yaml
+from typing import Any, Dict, List, Union
+
+DEFAULT_MAX_QUEUE = 16                  # maximum number of result blocks waiting to be written
+DEFAULT_FLUSH_INTERVAL = 5.0            # seconds between writes
+DEFAULT_BATCH_SIZE = 100000             # number of rows that triggers a write regardless of the interval
+DURABILITY_POLICIES = ('none', 'flush', 'fsync')
+
+
+class ResultsWriter:
+
+    def __init__(self, path: str, env_name: str,
+                 max_queue: int = DEFAULT_MAX_QUEUE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 durability: str = 'flush',
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        """
+        Writes the data into a csv-file in a background thread. Result blocks are taken from a bounded queue and
+        batched into large sequential writes; write() blocks when the queue is full.
+        :param path: directory for saving
+        :param env_name: file name
+        :param max_queue: maximum number of result blocks waiting to be written
+        :param flush_interval: maximum time in seconds between writes
+        :param durability: 'none' leaves the data in the buffers, 'flush' flushes the file after every write,
+        and 'fsync' also forces the data to the disk
+        :param batch_size: number of rows that triggers a write before the flush interval has passed
+        """
+        assert durability in DURABILITY_POLICIES, f'Durability policy must be one of {DURABILITY_POLICIES}'
+        self._file_name = f'{path}/{env_name}.csv'
+        self._metadata_name = f'{path}/metadata.yml'
+        self._path = path
+        self._flush_interval = flush_interval
+        self._durability = durability
+        self._batch_size = batch_size
+        self._queue = queue.Queue(maxsize=max(max_queue, 1))
+        self._error = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._work, name='ResultsWriter', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, results: List[Dict[str, Union[str, int, float]]]):
+        """
+        queues the data for writing
+        :param results: data to save
+        """
+        self._check()
+        if len(results) > 0:
+            self._queue.put(results)
+
+    def write_metadata(self, metadata: Dict[str, Any]):
+        """
+        queues a description of the run that replaces metadata.yml once all of the data queued before it is written,
+        so that the file never describes more results than the csv-file holds
+        :param metadata: dictionary of plain python values
+        """
+        self._check()
+        self._queue.put(metadata)
+
+    def qsize(self) -> int:
+        """
+        number of result blocks waiting to be written
+        """
+        return self._queue.qsize()
+
+    def close(self):
+        """
+        writes all of the queued data and stops the background thread
+        """
+        if self._closed:
+            return
+        self._closed = True
+        atexit.unregister(self.close)
+        self._queue.put(None)
+        self._thread.join()
+        self._check()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _check(self):
+        if self._error is not None:
+            raise RuntimeError('Results writer failed') from self._error
+
+    def _work(self):
+        csvfile, writer, buffer = None, None, io.StringIO()
+        batch, rows = [], 0
+        finished = False
+        deadline = time.monotonic() + self._flush_interval
+        try:
+            while True:
+                try:
+                    block = self._queue.get(timeout=max(deadline - time.monotonic(), 0.0))
+                except queue.Empty:
+                    block = []
+                finished = block is None
+                metadata = block if isinstance(block, dict) else None
+                if not finished and metadata is None and len(block) > 0:
+                    batch.append(block)
+                    rows += len(block)
+                if rows > 0 and (finished or metadata is not None or rows >= self._batch_size
+                                 or time.monotonic() >= deadline):
+                    if csvfile is None:
+                        csvfile, writer = self._open(buffer, batch[0][0].keys())
+                    for results in batch:
+                        writer.writerows(results)
+                    self._flush(csvfile, buffer)
+                    batch, rows = [], 0
+                if metadata is not None:
+                    self._write_metadata(metadata)
+                if time.monotonic() >= deadline:
+                    deadline = time.monotonic() + self._flush_interval
+                if finished:
+                    break
+        except BaseException as e:
+            self._error = e
+            # keep consuming so that the producer never blocks on a full queue
+            while not finished:
+                finished = self._queue.get() is None
+        finally:
+            if csvfile is not None:
+                csvfile.close()
+
+    def _open(self, buffer, field_names):
+        file_exists = os.path.exists(self._file_name)
+        if not file_exists:
+            os.makedirs(self._path, exist_ok=True)
+        csvfile = open(self._file_name, 'a', newline='')
+        writer = csv.DictWriter(buffer, fieldnames=field_names)
+        if not file_exists:
+            writer.writeheader()
+        return csvfile, writer
+
+    def _write_metadata(self, metadata):
+        os.makedirs(self._path, exist_ok=True)
+        temp_name = self._metadata_name + '.tmp'
+        with open(temp_name, 'w') as f:
+            yaml.safe_dump(metadata, f, sort_keys=False)
+            if self._durability == 'fsync':
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temp_name, self._metadata_name)
+
+    def _flush(self, csvfile, buffer):
+        csvfile.write(buffer.getvalue())
+        buffer.seek(0)
+        buffer.truncate()
+        if self._durability != 'none':
+            csvfile.flush()
+        if self._durability == 'fsync':
+            os.fsync(csvfile.fileno())
@@ -0,0 +1,243 @@
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import os
+import yaml
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_SAVE_DIR = 'results'
+DEFAULT_STAT = 'total reward'
+DEFAULT_FORMATS = ('png',)
+DEFAULT_SMOOTHING = 0.05                # fraction of the episodes to smooth the plots over
+DEFAULT_IQR = 0.0                       # inter-quantile range to plot; none if 0
+METADATA_FILE = 'metadata.yml'
+SUMMARY_SUFFIX = '.summary.npz'
+
+
+def find_runs(save_dir: str) -> List[Tuple[str, str]]:
+    """
+    finds the stored runs, i.e., the directories with a results csv-file written by run.run() or service.run()
+    :param save_dir: directory where the data is saved
+    :return: a list of (run directory, csv-file) pairs
+    """
+    runs = []
+    for file_name in sorted(glob.glob(os.path.join(save_dir, '**', '*.csv'), recursive=True)):
+        runs.append((os.path.dirname(file_name), file_name))
+    return runs
+
+
+def load_run(file_name: str) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    loads the results of a run together with its metadata.yml, if there is one
+    :param file_name: the results csv-file
+    :return: (metadata, results); the numbers in the results are converted back from strings
+    """
+    metadata = None
+    metadata_name = os.path.join(os.path.dirname(file_name), METADATA_FILE)
+    if os.path.exists(metadata_name):
+        with open(metadata_name) as f:
+            metadata = yaml.safe_load(f)
+    with open(file_name, newline='') as f:
+        results = [{key: _number(value) for key, value in row.items()} for row in csv.DictReader(f)]
+    return metadata, results
+
+
+def signature(file_name: str, stat: str, smoothing: Optional[float], iqr: Optional[float]) -> str:
+    """
+    computes a key of the inputs of a run's figure: the sizes and modification times of its files and the options
+    :param file_name: the results csv-file
+    :param stat: stat to plot
+    :param smoothing: fraction of the episodes to smooth the plots over; taken from the metadata if None
+    :param iqr: inter-quantile range to plot; taken from the metadata if None
+    :return: hex digest of the key
+    """
+    inputs = [stat, smoothing, iqr]
+    for name in (file_name, os.path.join(os.path.dirname(file_name), METADATA_FILE)):
+        if os.path.exists(name):
+            status = os.stat(name)
+            inputs.append([name, status.st_size, status.st_mtime_ns])
+    return hashlib.sha256(json.dumps(inputs).encode()).hexdigest()
+
+
+def render(file_name: str, figures: List[str], stat: str = DEFAULT_STAT, smoothing: Optional[float] = None,
+           iqr: Optional[float] = None, force: bool = False) -> List[str]:
+    """
+    renders the figure of a run with the Agg backend. The smoothed curves are stored next to the figures and reused
+    as long as the run's files and the options have not changed; figures that are newer than the curves are skipped.
+    :param file_name: the results csv-file
+    :param figures: files to save the figure to; the format is given by the extension
+    :param stat: stat to plot
+    :param smoothing: fraction of the episodes to smooth the plots over; taken from the metadata if None
+    :param iqr: inter-quantile range to plot; taken from the metadata if None
+    :param force: render the figures even if they are up to date
+    :return: the figures that were rendered
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import numpy as np
+    import process_results as pr
+
+    key = signature(file_name, stat, smoothing, iqr)
+    summary_name = os.path.splitext(figures[0])[0] + SUMMARY_SUFFIX
+    summary = _load_summary(summary_name, key)
+    if summary is not None and not force:
+        figures = [figure for figure in figures
+                   if not os.path.exists(figure) or os.path.getmtime(figure) < os.path.getmtime(summary_name)]
+    if not figures:
+        return []
+
+    if summary is None:
+        summary = _summarize(file_name, stat, smoothing, iqr)
+        os.makedirs(os.path.dirname(summary_name) or '.', exist_ok=True)
+        arrays = {f'{i}/{curve}': values
+                  for i, method in enumerate(summary['methods']) for curve, values in summary['curves'][method].items()}
+        tmp_name = f'{summary_name}.{os.getpid()}.tmp'
+        with open(tmp_name, 'wb') as f:
+            np.savez(f, signature=key, header=json.dumps({name: value for name, value in summary.items()
+                                                          if name != 'curves'}), **arrays)
+        os.replace(tmp_name, summary_name)
+
+    for figure in figures:
+        os.makedirs(os.path.dirname(figure) or '.', exist_ok=True)
+    pr.plot(None, title=summary['title'], solution=summary['solution'], episodes=summary['episodes'],
+            ma=summary['ma'], file_name=figures, summaries=summary['curves'])
+    return figures
+
+
+def report(save_dir: str = DEFAULT_SAVE_DIR, report_dir: Optional[str] = None,
+           formats: Optional[List[str]] = None, stat: str = DEFAULT_STAT, smoothing: Optional[float] = None,
+           iqr: Optional[float] = None, workers: Optional[int] = None, force: bool = False,
+           verbose: int = 0) -> List[str]:
+    """
+    renders the figures of all stored runs in parallel worker processes
+    :param save_dir: directory where the data is saved
+    :param report_dir: directory for the figures, mirroring the layout of save_dir; the run directories if None
+    :param formats: file formats of the figures, e.g., ['png', 'svg']
+    :param stat: stat to plot
+    :param smoothing: fraction of the episodes to smooth the plots over; taken from each run's metadata if None
+    :param iqr: inter-quantile range to plot; taken from each run's metadata if None
+    :param workers: number of worker processes; the number of CPUs by default
+    :param force: render the figures even if they are up to date
+    :param verbose: verbosity
+    :return: the figures that were rendered
+    """
+    formats = DEFAULT_FORMATS if formats is None else formats
+    runs = find_runs(save_dir)
+    rendered = []
+    with ProcessPoolExecutor(workers) as pool:
+        futures = {}
+        for path, file_name in runs:
+            out_dir = path if report_dir is None else os.path.join(report_dir, os.path.relpath(path, save_dir))
+            base = os.path.join(out_dir, os.path.splitext(os.path.basename(file_name))[0])
+            figures = [f'{base}.{file_format}' for file_format in formats]
+            futures[pool.submit(render, file_name, figures, stat, smoothing, iqr, force)] = file_name
+        for future in as_completed(futures):
+            try:
+                figures = future.result()
+            except Exception as e:
+                print(f'Failed to render {futures[future]}: {type(e).__name__}: {e}')
+                continue
+            rendered.extend(figures)
+            if verbose >= 1:
+                print(f'{futures[future]}: ' + (', '.join(figures) if figures else 'up to date'))
+    if verbose >= 1:
+        print(f'{len(runs)} runs, {len(rendered)} figures rendered.')
+    return rendered
+
+
+def _summarize(file_name, stat, smoothing, iqr):
+    import process_results as pr
+
+    metadata, results = load_run(file_name)
+    metadata = {} if metadata is None else metadata
+    params = metadata.get('params', {})
+    env_name = metadata.get('env', os.path.splitext(os.path.basename(file_name))[0])
+    solutions = [r for r in results if r['method'] == 'Solution']
+    results = [r for r in results if r['method'] != 'Solution']
+    solution = metadata.get('solution')
+    if solution is None and solutions:
+        solution = solutions[0].get('discounted total reward')
+
+    # an interrupted trial is only shown if no trial was completed, like in run.run()
+    trials = metadata.get('completed trials')
+    if trials is None:
+        trials = max([r['trial'] for r in results], default=-1) + 1
+        episodes = max([r['episode'] + (r.get('count') or 1) for r in results], default=0)
+    elif trials > 0:
+        episodes = params['episodes']
+    else:
+        trials, episodes = 1, metadata.get('completed episodes', 0)
+    results = [r for r in results if r['trial'] < trials]
+    assert episodes > 0 and results, f'{file_name} has no completed episodes'
+
+    smoothing = params.get('smoothing') if smoothing is None else smoothing
+    smoothing = DEFAULT_SMOOTHING if smoothing is None else smoothing
+    iqr = params.get('iqr') if iqr is None else iqr
+    ma = max(int(smoothing * episodes), 1)
+    q = (1.0 - iqr) / 2 if iqr is not None and 0.0 < iqr <= 1.0 else None
+    data = pr.fetch_stat(results, stat, episodes, trials)
+    discount = params.get('discount')
+    return {
+        'title': env_name if discount is None else '{}, d={}'.format(env_name, discount),
+        'solution': None if solution in (None, '') else float(solution),
+        'episodes': episodes,
+        'ma': ma,
+        'methods': list(data.keys()),
+        'curves': {method: pr.summarize(y, q, ma) for method, y in data.items()}
+    }
+
+
+def _load_summary(summary_name, key):
+    import numpy as np
+
+    try:
+        with np.load(summary_name) as f:
+            if str(f['signature']) != key:
+                return None
+            summary = json.loads(str(f['header']))
+            summary['curves'] = {method: {} for method in summary['methods']}
+            for name in f.files:
+                if '/' in name:
+                    i, curve = name.split('/', 1)
+                    summary['curves'][summary['methods'][int(i)]][curve] = f[name]
+    except (OSError, ValueError, KeyError):
+        return None
+    return summary
+
+
+def _number(value):
+    if value == '':
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def parse_args():
+    """
+    parse the command line arguments
+    :return: (dict) the arguments
+    """
+    parser = argparse.ArgumentParser(description='Render the figures of the stored runs in parallel')
+    parser.add_argument('--save_dir', help='Directory with the saved data', type=str, default=DEFAULT_SAVE_DIR)
+    parser.add_argument('--report_dir', help='Directory for the figures; next to the data by default', type=str)
+    parser.add_argument('--formats', help='File formats of the figures', type=str, nargs='+')
+    parser.add_argument('--stat', help='Stat to plot', type=str, default=DEFAULT_STAT)
+    parser.add_argument('--smoothing', help='Percentage of episode to smooth plots over', type=float)
+    parser.add_argument('--iqr', help='Interquantile range to plot, from 0.0 to 1.0', type=float)
+    parser.add_argument('--workers', help='Number of worker processes', type=int)
+    parser.add_argument('--force', help='Render the figures even if they are up to date', action='store_true')
+    parser.add_argument('-v', '--verbose', help='increase output verbosity', action='count', default=0)
+    return vars(parser.parse_args())
+
+
+if __name__ == '__main__':
+    report(**parse_args())
@@ -1,7 +1,10 @@
 # -*- coding: utf-8 -*-
-from typing import Union, Optional
+from typing import Union, Optional, List, Dict, Any
 import process_results as pr
 import os
+import random
+import time
+import numpy as np
 from datetime import datetime
 from gym import Env, make
 from gym.wrappers import TimeLimit
@@ -26,7 +29,41 @@ def run(
         save_dir: str = 'results',
         plot: bool = True,
         smoothing: float = 0.05,
-        iqr: float = 0.0
+        iqr: float = 0.0,
+        cache_dir: Optional[str] = None,
+        cache_size: Optional[float] = None,
+        clear_cache: bool = False,
+        env_kwargs: Optional[Dict[str, Any]] = None,
+        methods: Optional[List[str]] = None,
+        seed: Optional[int] = None,
+        run_name: Optional[str] = None,
+        writer_queue: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        durability: Optional[str] = None,
+        q_dtype: Optional[str] = None,
+        count_dtype: Optional[str] = None,
+        metrics_port: Optional[int] = None,
+        metrics_file: Optional[str] = None,
+        record: Optional[str] = None,
+        record_window: Optional[int] = None,
+        record_block: Optional[int] = None,
+        record_levels: Optional[int] = None,
+        history_dir: Optional[str] = None,
+        history_every: Optional[int] = None,
+        history_dtype: Optional[str] = None,
+        history_min_delta: Optional[float] = None,
+        trajectory_dir: Optional[str] = None,
+        early_stopping: bool = False,
+        stopping_epsilon: Optional[float] = None,
+        stopping_window: Optional[int] = None,
+        stopping_every: Optional[int] = None,
+        time_budget: Optional[float] = None,
+        chunk: Optional[int] = None,
+        fused: bool = False,
+        intern_observations: bool = False,
+        num_states: Optional[int] = None,
+        stationary: bool = False,
+        policy_dir: Optional[str] = None
 ):
     """
     Runs three agents (UCB-H+, UCB, and Q-Learning) in a given environment
@@ -51,14 +88,302 @@ def run(
     :param plot: whether to plot the experiment data or not
     :param smoothing: moving-average smoothing relative to the number of episodes
     :param iqr: inter-quantile range for plotting
+    :param cache_dir: directory for caching compiled models and solutions; if None, nothing is cached
+    :param cache_size: maximum size of the cache in megabytes
+    :param clear_cache: whether to clear the cache before running
+    :param env_kwargs: keyword arguments for gym.make(env) if the environment is given as a string
+    :param methods: names of the agents to run ('QUCBPlus', 'QUCB', 'Q_max'); if None, all agents are run
+    :param seed: seed for the random number generators of the environment and the agents
+    :param run_name: name of the subdirectory to save the data in; if None, the current date and time is used
+    :param writer_queue: maximum number of result blocks waiting to be saved before the learning is paused
+    :param flush_interval: maximum time in seconds between writes to the results file
+    :param durability: 'none', 'flush', or 'fsync'; how hard to push the results to the disk after every write
+    :param q_dtype: floating point type of the agents' Q-tables, e.g., 'float32'; 'float64' by default
+    :param count_dtype: integer type of the agents' visit counts, e.g., 'uint32' or 'uint16'; 'int64' by default
+    :param metrics_port: if given, operational metrics are served in the Prometheus text format on this local port
+    :param metrics_file: if given, operational metrics are periodically written to this file
+    :param record: 'full' to record every episode, or 'fixed' or 'geometric' to record only the first episodes
+    individually and the rest as a pyramid of block aggregates with fixed or geometrically growing blocks
+    :param record_window: number of episodes at the start of each trial that are recorded individually
+    :param record_block: number of episodes in the finest blocks; by default a tenth of the smoothing window
+    :param record_levels: number of levels in the pyramid of block aggregates
+    :param history_dir: if given, snapshots of the agents' Q-tables and visit counts are recorded into
+    memory-mapped files in this directory, one set of files per agent and trial
+    :param history_every: number of episodes between the snapshots
+    :param history_dtype: storage type of the recorded Q-values, 'float16' or 'float32'
+    :param history_min_delta: snapshots that differ from the previous one by less than this are skipped
+    :param trajectory_dir: if given, every transition of every agent is recorded into this directory,
+    one file per agent and trial; see agent.load_trajectory() and agent.EpisodicQLearningAgent.replay()
+    :param early_stopping: whether to stop an agent's trial once its greedy policy has converged to the optimum;
+    the remaining episodes are filled in with the expected results of that policy
+    :param stopping_epsilon: allowed gap between the value of the converged policy and the optimum
+    :param stopping_window: number of episodes the greedy policy must stay near-optimal
+    :param stopping_every: number of episodes between the convergence checks
+    :param time_budget: wall time in seconds the run may take; the agents are interleaved in chunks of episodes
+    and the run stops before a chunk that would exceed the budget. Partial results are saved after every chunk
+    (or after every trial for block aggregates) and metadata.yml records how much of the run was completed.
+    :param chunk: number of episodes each agent runs before the next agent takes over;
+    by default a hundredth of the episodes with a time budget and all of them without one
+    :param fused: whether the agents run their episodes in a single fused loop; the results are identical
+    :param intern_observations: whether to map the observations to dense ids on first sight (agent.InterningWrapper),
+    so that the agents can learn in environments with any hashable observations and their tables grow with the number
+    of states seen; the solution is only computed if the environment has a model. History recording, early stopping,
+    and policy export are not available then, since the ids depend on the order in which the states are seen
+    :param num_states: upper bound on the number of states of an interned environment if it cannot be inferred
+    from the observation space
+    :param stationary: whether the agents learn a single Q-table for all time steps; requires a discount below 1.
+    The solution is then the value of the infinite-horizon problem.
+    :param policy_dir: if given, the greedy policy of every agent is exported into this directory at the end of each
+    trial together with its Q-margins; see agent.EpisodicQLearningAgent.export_policy() and policy_table.PolicyTable
     """
-    import agent
-    import environment  # this is required for custom environments to show up in the OpenAI Gym registry
+    from agent import TrajectoryRecorder
+
+    start_time = time.perf_counter()
 
     # Initialize the environment an make it a TimeLimit environment for episodic learning
+    env, env_name, steps = make_env(env, steps, env_kwargs, intern_observations, num_states)
+    assert not intern_observations or (history_dir is None and not early_stopping and policy_dir is None), \
+        'History recording, early stopping, and policy export require fixed state ids'
+
+    if seed is not None:
+        set_seed(env, seed)
+
+    # If verbosity is not given, use 0, i.e., no console output
+    if verbose is None:
+        verbose = 0
+
+    # Initialize the agents
+    agents = make_agents(env, steps, discount, starting_q, exploration_rate, exploration_rate_decay,
+                         min_exploration_rate, delta, c, lamb, omega, verbose, methods, q_dtype, count_dtype,
+                         fused, stationary)
+
+    # Start the experiments
+    if verbose >= 1:
+        print(f'Starting environment {env_name}.\n')
+    results = []
+
+    # Find an exact solution by solving the underlying MDP if there is one. This solution is used in plotting
+    cache = None
+    if cache_dir is not None:
+        max_size = pr.cache.DEFAULT_MAX_SIZE if cache_size is None else int(cache_size * (1 << 20))
+        cache = pr.ModelCache(cache_dir, max_size)
+        if clear_cache:
+            cache.invalidate()
+    solved, solution = None, None
+    if hasattr(env.unwrapped, 'P'):
+        solved = pr.solution(env.unwrapped if intern_observations else env, discount,
+                             np.PINF if stationary else steps, cache)
+        solution = float(solved['value'])
+        if verbose >= 1:
+            print(f'Value: {solution}.\n')
+
+    # Build a path to save directory
+    if run_name is None:
+        run_name = datetime.now().strftime('%Y-%m-%d-%H-%M')
+    path = os.path.join(save_dir, env_name, run_name) if save else None
+
+    writer = None
+    if save:
+        writer = pr.ResultsWriter(
+            path, env_name,
+            max_queue=pr.writer.DEFAULT_MAX_QUEUE if writer_queue is None else writer_queue,
+            flush_interval=pr.writer.DEFAULT_FLUSH_INTERVAL if flush_interval is None else flush_interval,
+            durability='flush' if durability is None else durability
+        )
+
+    # Record block aggregates instead of single episodes if requested
+    recording = {
+        'window': record_window,
+        'block': max(int(smoothing * episodes) // 10, 1) if record_block is None else record_block,
+        'levels': record_levels
+    }
+    recording = {key: value for key, value in recording.items() if value is not None}
+
+    # Publish the operational metrics if requested
+    metrics = pr.Metrics(trials * episodes * len(agents), writer)
+    publishers = []
+    if metrics_port is not None:
+        publishers.append(pr.MetricsServer(metrics, metrics_port))
+    if metrics_file is not None:
+        publishers.append(pr.MetricsFile(metrics, metrics_file))
+    if publishers:
+        for a in agents:
+            a.set_monitor(metrics)
+
+    # Stop the agents once they have converged if requested
+    if early_stopping:
+        stopping = {
+            'epsilon': stopping_epsilon,
+            'window': stopping_window,
+            'every': stopping_every
+        }
+        stopping = {key: value for key, value in stopping.items() if value is not None}
+        # the greedy policies are evaluated over the episodes, also for stationary agents
+        episodic = pr.solution(env, discount, steps, cache) if stationary else solved
+        if 'transitions' not in episodic:
+            # sparsely solved problems are evaluated on their dense model
+            t, r = pr.compile_model(env.unwrapped)
+            episodic = {**episodic, 'transitions': t, 'rewards': r}
+        for a in agents:
+            a.set_stopping_rule(pr.ConvergenceRule(episodic, float(episodic['value']), discount, **stopping))
+
+    # Spend the time budget in rounds that run every agent for a chunk of episodes, so that all agents progress
+    # equally; without a budget each agent runs a whole trial at once
+    if chunk is None:
+        chunk = episodes if time_budget is None else max(episodes // 100, 1)
+    completed_trials, completed_episodes, out_of_time = 0, 0, False
+    # time of a round per episode, measured in the last round and carried over to the next trial
+    episode_time = 0.0
+
+    def describe(finished):
+        done = completed_trials * episodes + completed_episodes
+        return {
+            'env': env_name,
+            'run': run_name,
+            'params': {'trials': trials, 'episodes': episodes, 'steps': int(steps), 'discount': float(discount),
+                       'methods': [a.name for a in agents], 'seed': seed, 'record': record,
+                       'smoothing': smoothing, 'iqr': iqr, 'time_budget': time_budget, 'chunk': chunk},
+            'solution': solution,
+            'completed trials': completed_trials,
+            'completed episodes': completed_episodes,
+            'fraction': done / (trials * episodes),
+            'stopped early': out_of_time,
+            'finished': finished,
+            'elapsed': time.perf_counter() - start_time
+        }
+
+    try:
+        # Run the trials
+        for trial in range(trials):
+
+            if verbose >= 1:
+                print(f'Starting trial #{trial}.\n')
+            metrics.start_trial(trial)
+
+            # Prepare each agent and its recorders for the trial
+            recorders = []
+            for agent in agents:
+                if history_dir is not None:
+                    every = pr.history.DEFAULT_EVERY if history_every is None else history_every
+                    recorder = pr.HistoryRecorder(
+                        os.path.join(history_dir, env_name, run_name, agent.name, f'trial_{trial}'),
+                        episodes // every, every,
+                        dtype=pr.history.DEFAULT_DTYPE if history_dtype is None else history_dtype,
+                        min_delta=0.0 if history_min_delta is None else history_min_delta
+                    )
+                    agent.set_recorder(recorder)
+                    recorders.append((recorder, agent.set_recorder))
+                if trajectory_dir is not None:
+                    trajectory_path = os.path.join(trajectory_dir, env_name, run_name, agent.name)
+                    os.makedirs(trajectory_path, exist_ok=True)
+                    trajectory = TrajectoryRecorder(os.path.join(trajectory_path, f'trial_{trial}.bin'))
+                    agent.set_trajectory_recorder(trajectory)
+                    recorders.append((trajectory, agent.set_trajectory_recorder))
+
+            # Run the agents in rounds of chunks until the trial is done or the next round would exceed the budget
+            completed_episodes = 0
+            while completed_episodes < episodes:
+                n = min(chunk, episodes - completed_episodes)
+                if time_budget is not None and \
+                        time.perf_counter() - start_time + episode_time * n > time_budget:
+                    out_of_time = True
+                    break
+                round_start = time.perf_counter()
+                for agent in agents:
+                    if completed_episodes == 0:
+                        agent.reset_environment()
+                    agent.run(n)
+                episode_time = (time.perf_counter() - round_start) / n
+                completed_episodes += n
+
+                # Every episode is saved as soon as its round is done
+                if record is None or record == 'full':
+                    for agent in agents:
+                        result = agent.get_stats(start=completed_episodes - n)
+                        result = [{**{'method': agent.name, 'trial': trial}, **r} for r in result]
+                        if save:
+                            writer.write(result)
+                        results.extend(result)
+                    if save:
+                        writer.write_metadata(describe(False))
+
+            for recorder, detach in recorders:
+                recorder.close()
+                detach(None)
+
+            # Export the learned policies for use outside of the experiments
+            if policy_dir is not None and completed_episodes > 0:
+                for agent in agents:
+                    policy_path = os.path.join(policy_dir, env_name, run_name, agent.name)
+                    os.makedirs(policy_path, exist_ok=True)
+                    agent.export_policy(os.path.join(policy_path, f'trial_{trial}.pol'), margins=True)
+
+            # Block aggregates are saved once the trial is done or interrupted
+            if record is not None and record != 'full' and completed_episodes > 0:
+                for agent in agents:
+                    result = agent.get_stats()
+                    result = [{**{'method': agent.name, 'trial': trial}, **r} for r in result]
+                    result = pr.aggregate(result, spacing=record, **recording)
+                    if save:
+                        writer.write(result)
+                    results.extend(result)
+
+            if out_of_time:
+                if verbose >= 1:
+                    print(f'Time budget exhausted after {completed_episodes} episodes of trial #{trial}.\n')
+                break
+            completed_trials, completed_episodes = completed_trials + 1, 0
+            if save:
+                writer.write_metadata(describe(False))
+
+            if verbose >= 1:
+                print(f'Trial #{trial} done.\n')
+
+        # Add the solution to the results file
+        if save and results and solution is not None:
+            solution_dict = {key: '' for key in results[0].keys()}
+            solution_dict['method'] = 'Solution'
+            solution_dict['trial'] = 0
+            solution_dict['episode'] = 0
+            solution_dict['discounted total reward'] = solution
+            writer.write([solution_dict])
+        if save:
+            writer.write_metadata(describe(True))
+    finally:
+        # Write out everything that is still queued, also when interrupted
+        if save:
+            writer.close()
+        for publisher in publishers:
+            publisher.close()
+
+    # Visualize the data if plotting is on; an interrupted trial is only shown if no trial was completed
+    plot_trials, plot_episodes = (completed_trials, episodes) if completed_trials > 0 else (1, completed_episodes)
+    if plot and plot_episodes > 0:
+        results = [r for r in results if r['trial'] < plot_trials]
+        results = pr.fetch_stat(results, 'total reward', plot_episodes, plot_trials)
+        plot_quantiles = iqr is not None and 0.0 < iqr <= 1.0
+        pr.plot(results, title='{}, d={}'.format(env_name, discount), solution=solution, episodes=plot_episodes,
+                ma=int(smoothing * plot_episodes), show_q=plot_quantiles, iqr=iqr)
+
+
+def make_env(env: Union[Env, str], steps: Optional[int] = None, env_kwargs: Optional[Dict[str, Any]] = None,
+             intern_observations: bool = False, num_states: Optional[int] = None):
+    """
+    Initializes the environment and makes it a TimeLimit environment for episodic learning
+    :param env: Environment: either an OpenAI Gym environment or a string;
+    in the latter case gym.make(env) will be used.
+    :param steps: Number of time steps per episode
+    :param env_kwargs: keyword arguments for gym.make(env) if the environment is given as a string
+    :param intern_observations: whether to map the observations to dense ids inside the TimeLimit
+    :param num_states: upper bound on the number of states of an interned environment
+    :return: (environment, environment's name, number of steps)
+    """
+    import environment  # this is required for custom environments to show up in the OpenAI Gym registry
+    from agent import InterningWrapper
+
     if isinstance(env, str):
         env_name = env
-        env = make(env_name)
+        env = make(env_name, **({} if env_kwargs is None else env_kwargs))
     else:
         env_name = type(env).__name__
     if not isinstance(env, TimeLimit):
@@ -69,10 +394,35 @@ def run(
             steps = env._max_episode_steps
         else:
             env._max_episode_steps = steps
+    if intern_observations:
+        env = TimeLimit(InterningWrapper(env, num_states), steps)
+    return env, env_name, steps
 
-    # If verbosity is not given, use 0, i.e., no console output
-    if verbose is None:
-        verbose = 0
+
+def make_agents(
+        env: TimeLimit,
+        steps: int,
+        discount: float = 1.0,
+        starting_q: Optional[float] = None,
+        exploration_rate: float = 1.0,
+        exploration_rate_decay: float = 0.99,
+        min_exploration_rate: float = 0.00,
+        delta: float = 0.001,
+        c: float = 0.0,
+        lamb: float = 1.0,
+        omega: float = 0.8,
+        verbose: int = 0,
+        methods: Optional[List[str]] = None,
+        q_dtype: Optional[str] = None,
+        count_dtype: Optional[str] = None,
+        fused: bool = False,
+        stationary: bool = False
+):
+    """
+    Initializes the three agents (UCB-H+, UCB, and Q-Learning); see run() for the parameters
+    :return: a list of agents
+    """
+    import agent
 
     # If starting Q-value for Q-learning is not supplied, try to infer it from the environment
     if starting_q is None:
@@ -80,6 +430,12 @@ def run(
         starting_q = reward_max / (1.0 - discount) if discount < 1 else reward_max * steps
 
     # Initialize the agents
+    options = {
+        'q_dtype': agent.episodic_q_learning_agent.DEFAULT_Q_DTYPE if q_dtype is None else q_dtype,
+        'count_dtype': agent.episodic_q_learning_agent.DEFAULT_COUNT_DTYPE if count_dtype is None else count_dtype,
+        'fused': bool(fused),
+        'stationary': bool(stationary)
+    }
     agents = [
         agent.QUCBHPlusLearningAgent(
             env=env,
@@ -89,7 +445,8 @@ def run(
             delta=delta,
             c=c,
             lam=lamb,
-            omega=omega
+            omega=omega,
+            **options
         ),
         agent.QUCBHLearningAgent(
             env=env,
@@ -98,6 +455,7 @@ def run(
             discount=discount,
             delta=delta,
             c=c,
+            **options
         ),
         agent.SimpleQLearningAgent(
             env=env,
@@ -105,57 +463,21 @@ def run(
             name='Q_max',
             verb=verbose,
             discount=discount,
-            starting_q=starting_q
+            starting_q=starting_q,
+            **options
         )
     ]
+    if methods is not None:
+        agents = [a for a in agents if a.name in methods]
+    return agents
 
-    # Start the experiments
-    if verbose >= 1:
-        print(f'Starting environment {env_name}.\n')
-    results = []
-
-    # Find an exact solution by solving the underlying MDP. This solution is used in plotting
-    solution = pr.solve(env, discount, steps)
-    if verbose >= 1:
-        print(f'Value: {solution}.\n')
-
-    # Build a path to save directory
-    path = os.path.join(save_dir, env_name, datetime.now().strftime('%Y-%m-%d-%H-%M')) if save else None
-
-    # Run the trials
-    for trial in range(trials):
-
-        if verbose >= 1:
-            print(f'Starting trial #{trial}.\n')
 
-        # Run each agent for the given number of episodes
-        for agent in agents:
-            agent.reset_environment()
-            agent.run(episodes)
-
-            result = agent.get_stats()
-            result = [{**{'method': agent.name, 'trial': trial}, **r} for r in result]
-
-            if save:
-                pr.save(path, env_name, result)
-
-            results.extend(result)
-
-        if verbose >= 1:
-            print(f'Trial #{trial} done.\n')
-
-    # Add the solution to the results file
-    if save:
-        solution_dict = {key: '' for key in results[0].keys()}
-        solution_dict['method'] = 'Solution'
-        solution_dict['trial'] = 0
-        solution_dict['episode'] = 0
-        solution_dict['discounted total reward'] = solution
-        pr.save(path, env_name, [solution_dict])
-
-    # Visualize the data if plotting is on
-    if plot:
-        results = pr.fetch_stat(results, 'total reward', episodes, trials)
-        plot_quantiles = iqr is not None and 0.0 < iqr <= 1.0
-        pr.plot(results, title='{}, d={}'.format(env_name, discount), solution=solution, episodes=episodes,
-                ma=int(smoothing * episodes), show_q=plot_quantiles, iqr=iqr)
+def set_seed(env: Env, seed: int):
+    """
+    Seeds the random number generators used by the environment and the agents' policies
+    :param env: environment
+    :param seed: seed
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+    env.seed(seed)
@@ -0,0 +1,276 @@
+import argparse
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from multiprocessing.connection import Client, Listener
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_ADDRESS = os.path.join(tempfile.gettempdir(), f'ucbh-{os.getuid()}.sock')
+DEFAULT_AUTHKEY = b'ucbh'
+
+# run() arguments the workers need to run a trial
+TRIAL_KEYS = ('env', 'episodes', 'steps', 'discount', 'starting_q', 'exploration_rate', 'exploration_rate_decay',
+              'min_exploration_rate', 'delta', 'c', 'lamb', 'omega', 'env_kwargs', 'methods', 'seed', 'q_dtype',
+              'count_dtype', 'fused', 'stationary', 'record', 'record_window', 'record_block', 'record_levels',
+              'smoothing')
+
+# environments built by a worker, kept warm between the experiments
+_envs = {}
+
+
+def _warm_up():
+    import environment  # noqa: F401, this is required for custom environments to show up in the OpenAI Gym registry
+    import agent  # noqa: F401
+    import process_results  # noqa: F401
+    import run  # noqa: F401
+
+
+def _environment(env: str, steps: Optional[int], env_kwargs: Optional[Dict[str, Any]]):
+    from run import make_env
+
+    key = (env, steps, repr(sorted(env_kwargs.items())) if env_kwargs else None)
+    if key not in _envs:
+        _envs[key] = make_env(env, steps, env_kwargs)
+    return _envs[key]
+
+
+def _solve(env: str, steps: Optional[int], env_kwargs: Optional[Dict[str, Any]], discount: float,
+           stationary: bool = False) -> Optional[float]:
+    import numpy as np
+    import process_results as pr
+
+    env, _, steps = _environment(env, steps, env_kwargs)
+    if not hasattr(env.unwrapped, 'P'):
+        return None
+    return pr.solve(env.unwrapped, discount, np.PINF if stationary else steps)
+
+
+def _run_trial(params: Dict[str, Any], trial: int) -> List[Dict[str, Any]]:
+    from run import make_agents, set_seed
+    import process_results as pr
+
+    env, _, steps = _environment(params['env'], params.get('steps'), params.get('env_kwargs'))
+    if params.get('seed') is not None:
+        set_seed(env, params['seed'] + trial)
+    agent_kwargs = {key: params[key] for key in ('starting_q', 'exploration_rate', 'exploration_rate_decay',
+                                                 'min_exploration_rate', 'delta', 'c', 'lamb', 'omega', 'methods',
+                                                 'q_dtype', 'count_dtype', 'fused', 'stationary')
+                    if params.get(key) is not None}
+    agents = make_agents(env, steps, params.get('discount', 1.0), **agent_kwargs)
+
+    results = []
+    record = params.get('record')
+    smoothing = 0.05 if params.get('smoothing') is None else params['smoothing']
+    recording = {
+        'window': params.get('record_window'),
+        'block': params.get('record_block') or max(int(smoothing * params['episodes']) // 10, 1),
+        'levels': params.get('record_levels')
+    }
+    recording = {key: value for key, value in recording.items() if value is not None}
+    for a in agents:
+        a.reset_environment()
+        a.run(params['episodes'])
+        result = [{**{'method': a.name, 'trial': trial}, **r} for r in a.get_stats()]
+        if record is not None and record != 'full':
+            result = pr.aggregate(result, spacing=record, **recording)
+        results.extend(result)
+    return results
+
+
+class ExperimentService:
+
+    def __init__(self, address: str = DEFAULT_ADDRESS, workers: Optional[int] = None,
+                 authkey: bytes = DEFAULT_AUTHKEY):
+        """
+        Local daemon that keeps a pool of worker processes with gym, the environments, and the agents imported,
+        and the solutions of the problems in memory. Experiments are submitted over a Unix socket with run();
+        their trials are run in parallel and the results are streamed back as the trials complete.
+        :param address: path of the Unix socket
+        :param workers: number of worker processes; the number of CPUs by default
+        :param authkey: key the clients must authenticate with
+        """
+        self._address = address
+        self._authkey = authkey
+        workers = (os.cpu_count() or 1) if workers is None else workers
+        self._pool = ProcessPoolExecutor(workers, initializer=_warm_up)
+        for _ in range(workers):
+            self._pool.submit(_warm_up)  # start all of the workers right away
+        self._solutions = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def serve(self):
+        """
+        accepts experiments until a client asks to stop
+        """
+        if os.path.exists(self._address):
+            os.remove(self._address)
+        with Listener(self._address, family='AF_UNIX', authkey=self._authkey) as listener:
+            os.chmod(self._address, 0o600)
+            while not self._stopped.is_set():
+                try:
+                    connection = listener.accept()
+                except OSError:
+                    continue
+                if self._stopped.is_set():
+                    # the wake-up call of a stop request
+                    connection.close()
+                    break
+                threading.Thread(target=self._handle, args=(connection,), daemon=True).start()
+        self._pool.shutdown()
+
+    def _handle(self, connection):
+        with connection:
+            try:
+                request = connection.recv()
+                if request.get('stop'):
+                    self._stopped.set()
+                    connection.send({'done': True})
+                    # wake up the listener so that it notices the stop
+                    try:
+                        Client(self._address, family='AF_UNIX', authkey=self._authkey).close()
+                    except OSError:
+                        pass
+                    return
+                self._run(connection, request['run'])
+            except (EOFError, OSError):
+                # the client went away; there is no one to reply to
+                pass
+            except Exception as e:
+                try:
+                    connection.send({'error': f'{type(e).__name__}: {e}'})
+                except OSError:
+                    pass
+
+    def _run(self, connection, params: Dict[str, Any]):
+        # the solution is computed once per problem and kept for the later experiments
+        key = (params['env'], params.get('steps'), repr(sorted((params.get('env_kwargs') or {}).items())),
+               params.get('discount', 1.0), bool(params.get('stationary')))
+        with self._lock:
+            solution = self._solutions.get(key)
+            if solution is None or solution.done() and solution.exception() is not None:
+                solution = self._solutions[key] = self._pool.submit(_solve, params['env'], params.get('steps'),
+                                                                    params.get('env_kwargs'),
+                                                                    params.get('discount', 1.0), key[-1])
+        trials = {self._pool.submit(_run_trial, params, trial): trial for trial in range(params.get('trials', 1))}
+        for future in as_completed(trials):
+            connection.send({'trial': trials[future], 'results': future.result()})
+        connection.send({'done': True, 'solution': solution.result()})
+
+
+def run(
+        env: str,
+        trials: int = 1,
+        episodes: int = 10000,
+        steps: Optional[int] = None,
+        discount: float = 1.0,
+        starting_q: Optional[float] = None,
+        exploration_rate: float = 1.0,
+        exploration_rate_decay: float = 0.99,
+        min_exploration_rate: float = 0.00,
+        delta: float = 0.001,
+        c: float = 0.0,
+        lamb: float = 1.0,
+        omega: float = 0.8,
+        verbose: Optional[int] = None,
+        save: bool = True,
+        save_dir: str = 'results',
+        plot: bool = True,
+        smoothing: float = 0.05,
+        iqr: float = 0.0,
+        env_kwargs: Optional[Dict[str, Any]] = None,
+        methods: Optional[List[str]] = None,
+        seed: Optional[int] = None,
+        run_name: Optional[str] = None,
+        q_dtype: Optional[str] = None,
+        count_dtype: Optional[str] = None,
+        fused: bool = False,
+        stationary: bool = False,
+        record: Optional[str] = None,
+        record_window: Optional[int] = None,
+        record_block: Optional[int] = None,
+        record_levels: Optional[int] = None,
+        address: str = DEFAULT_ADDRESS,
+        authkey: bytes = DEFAULT_AUTHKEY,
+        callback: Optional[Callable[[int, List[Dict[str, Any]]], None]] = None
+) -> Tuple[List[Dict[str, Any]], Optional[float]]:
+    """
+    Runs the agents like run.run() but in the experiment service, see ExperimentService. The environment must be
+    given by its name. The trials run in parallel; with a seed, trial t is seeded with seed + t.
+    :param address: path of the service's Unix socket
+    :param authkey: key to authenticate with
+    :param callback: function called with the trial number and its results as soon as a trial completes
+    :return: (results, solution)
+    See run.run() for the other parameters.
+    """
+    params = {key: value for key, value in locals().items() if key in TRIAL_KEYS or key == 'trials'}
+    verbose = 0 if verbose is None else verbose
+    if run_name is None:
+        run_name = datetime.now().strftime('%Y-%m-%d-%H-%M')
+    path = os.path.join(save_dir, env, run_name)
+
+    results, solution = [], None
+    with Client(address, family='AF_UNIX', authkey=authkey) as connection:
+        connection.send({'run': params})
+        while True:
+            message = connection.recv()
+            if 'error' in message:
+                raise RuntimeError(f'Experiment service failed: {message["error"]}')
+            if message.get('done'):
+                solution = message.get('solution')
+                break
+            if verbose >= 1:
+                print(f'Trial #{message["trial"]} done.\n')
+            if save:
+                from process_results import save as save_results
+                save_results(path, env, message['results'])
+            if callback is not None:
+                callback(message['trial'], message['results'])
+            results.extend(message['results'])
+
+    if save and results and solution is not None:
+        from process_results import save as save_results
+        solution_dict = {key: '' for key in results[0].keys()}
+        solution_dict.update({'method': 'Solution', 'trial': 0, 'episode': 0, 'discounted total reward': solution})
+        save_results(path, env, [solution_dict])
+
+    if plot and results:
+        import process_results as pr
+        data = pr.fetch_stat(results, 'total reward', episodes, trials)
+        plot_quantiles = iqr is not None and 0.0 < iqr <= 1.0
+        pr.plot(data, title='{}, d={}'.format(env, discount), solution=solution, episodes=episodes,
+                ma=int(smoothing * episodes), show_q=plot_quantiles, iqr=iqr)
+    return results, solution
+
+
+def stop(address: str = DEFAULT_ADDRESS, authkey: bytes = DEFAULT_AUTHKEY):
+    """
+    asks the experiment service to stop
+    :param address: path of the service's Unix socket
+    :param authkey: key to authenticate with
+    """
+    with Client(address, family='AF_UNIX', authkey=authkey) as connection:
+        connection.send({'stop': True})
+        connection.recv()
+
+
+def parse_args():
+    """
+    parse the command line arguments
+    :return: (dict) the arguments
+    """
+    parser = argparse.ArgumentParser(description='Local service that runs the experiments in warm worker processes')
+    parser.add_argument('command', help='Start or stop the service', choices=['start', 'stop'])
+    parser.add_argument('--address', help='Path of the Unix socket', type=str, default=DEFAULT_ADDRESS)
+    parser.add_argument('--workers', help='Number of worker processes', type=int)
+    return vars(parser.parse_args())
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args['command'] == 'start':
+        ExperimentService(args['address'], args['workers']).serve()
+    else:
+        stop(args['address'])